@@ -0,0 +1,262 @@
+"""Local stand-ins for OpenAI, SerpAPI and the crawler, so benchmarks cost nothing"""
+import asyncio
+import json
+import time
+import zlib
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from aiohttp import web
+from chainlit.emitter import BaseChainlitEmitter
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, DeltaToolCalls, FunctionModel
+
+from src.services.memory import NEW_MESSAGE_HEADER
+from src.services.prompts import CONTEXT_HEADER
+
+# Counters of the guest message being processed, shared by every task it spawns
+current_counters: ContextVar[Optional[Dict[str, int]]] = ContextVar(
+    "current_counters", default=None
+)
+
+FILLER = (
+    "We have taken care of everything and our team will keep you posted should anything change "
+    "during your stay with us at the hotel"
+).split()
+
+
+@dataclass
+class ModelProfile:
+    """Simulated model speed and reply size"""
+    first_token_latency: float = 0.25  # seconds until the first chunk
+    chunk_latency: float = 0.002  # seconds between streamed chunks
+    chunk_chars: int = 4  # roughly one token per chunk
+    reply_words: int = 40  # length of the guest-facing message
+
+
+def count(name: str, amount: int = 1) -> None:
+    counters = current_counters.get()
+    if counters is not None:
+        counters[name] = counters.get(name, 0) + amount
+
+
+def reply_text(prompt: str, words: int) -> str:
+    """Deterministic reply of about the requested length"""
+    text = [f"Certainly, I have arranged this for you: {prompt[:60]}."]
+    text.extend(FILLER[i % len(FILLER)] for i in range(max(words - 8, 0)))
+    return " ".join(text)
+
+
+class FakeLLM:
+    """Scripted stand-in for one agent's model.
+
+    Each run calls the agent's tools in a fixed order with arguments derived
+    from the guest message, then returns a final result built from what the
+    tools returned.
+    """
+
+    def __init__(self, agent_name: str, profile: ModelProfile):
+        self.agent_name = agent_name
+        self.profile = profile
+        self.model = FunctionModel(self.respond, stream_function=self.stream)
+
+    async def respond(self, messages: List[ModelMessage], info: AgentInfo) -> ModelResponse:
+        count("model_calls")
+        part = self._next_part(messages, info)
+        size = len(part.content) if isinstance(part, TextPart) else len(json.dumps(part.args))
+        await asyncio.sleep(
+            self.profile.first_token_latency
+            + self.profile.chunk_latency * size / self.profile.chunk_chars
+        )
+        return ModelResponse(parts=[part])
+
+    async def stream(
+        self, messages: List[ModelMessage], info: AgentInfo
+    ) -> AsyncIterator[Union[str, DeltaToolCalls]]:
+        count("model_calls")
+        part = self._next_part(messages, info)
+        await asyncio.sleep(self.profile.first_token_latency)
+        step = self.profile.chunk_chars
+        if isinstance(part, TextPart):
+            for i in range(0, len(part.content), step):
+                yield part.content[i:i + step]
+                await asyncio.sleep(self.profile.chunk_latency)
+            return
+
+        yield {0: DeltaToolCall(name=part.tool_name)}
+        args = json.dumps(part.args)
+        for i in range(0, len(args), step):
+            yield {0: DeltaToolCall(json_args=args[i:i + step])}
+            await asyncio.sleep(self.profile.chunk_latency)
+
+    def _next_part(
+        self, messages: List[ModelMessage], info: AgentInfo
+    ) -> Union[TextPart, ToolCallPart]:
+        prompt, returns = self._current_turn(messages)
+        tools = {tool.name for tool in info.function_tools}
+        called = [tool_return.tool_name for tool_return in returns]
+
+        for tool_name, args in self._plan(prompt, returns):
+            if tool_name in tools and tool_name not in called:
+                return ToolCallPart(tool_name=tool_name, args=args)
+
+        message = reply_text(prompt, self.profile.reply_words)
+        for tool_return in returns:
+            if isinstance(tool_return.content, dict) and tool_return.content.get("message"):
+                message = f"{tool_return.content['message']} {message}"
+        if not info.result_tools:
+            return TextPart(content=message)
+        result = {"status": "completed", "message": message, "eta": "15 minutes"}
+        return ToolCallPart(tool_name=info.result_tools[0].name, args=result)
+
+    def _plan(self, prompt: str, returns: List[ToolReturnPart]) -> List[tuple[str, Dict[str, Any]]]:
+        if self.agent_name == "supervisor":
+            from src.agents.router import router_for
+            from src.services.hotel_registry import hotel_registry
+
+            intent_router = router_for(hotel_registry.get())
+            requests = []
+            for part in prompt.replace(", and ", " and ").split(" and "):
+                route = intent_router.classify(part)
+                request_type = route.service or "concierge"
+                requests.append({"request_type": request_type, "description": part.strip()})
+            return [("delegate_tasks", {"requests": requests})]
+        if self.agent_name == "concierge":
+            plan = [("web_search", {"query": prompt})]
+            for tool_return in returns:
+                if tool_return.tool_name == "web_search" and tool_return.content:
+                    url = tool_return.content[0]["link"]
+                    plan.append(("get_website", {"url": url, "question": prompt}))
+            return plan
+        if self.agent_name == "room_service":
+            return [("search_menu", {"query": prompt})]
+        if self.agent_name == "maintenance":
+            return [("check_service", {"query": prompt})]
+        return []
+
+    @staticmethod
+    def _current_turn(messages: List[ModelMessage]) -> tuple[str, List[ToolReturnPart]]:
+        """The latest guest prompt and the tool results returned since"""
+        prompt = ""
+        returns: List[ToolReturnPart] = []
+        for message in messages:
+            if not isinstance(message, ModelRequest):
+                continue
+            for part in message.parts:
+                if isinstance(part, UserPromptPart):
+                    # The scripted plans only look at the guest's words, not the volatile context
+                    prompt, returns = part.content.split(f"\n\n{CONTEXT_HEADER}")[0], []
+                    prompt = prompt.split(f"{NEW_MESSAGE_HEADER}\n")[-1]
+                elif isinstance(part, ToolReturnPart):
+                    returns.append(part)
+        return prompt, returns
+
+
+@dataclass
+class FakeSerpApi:
+    """Local HTTP server answering like SerpAPI's Google engine"""
+    latency: float = 0.3
+    port: int = 0
+    requests: int = 0
+    _runner: Optional[web.AppRunner] = field(default=None, repr=False)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/search"
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/search", self._search)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _search(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        query = request.query.get("q", "")
+        results = [
+            {
+                "position": i + 1,
+                "title": f"Result {i + 1} for {query}",
+                "link": f"https://example.com/{i + 1}/{zlib.crc32(query.encode()) % 1000}",
+                "snippet": f"Everything about {query}, with opening hours and prices.",
+            }
+            for i in range(5)
+        ]
+        return web.json_response({"organic_results": results})
+
+
+@dataclass
+class FakeCrawlResult:
+    success: bool
+    markdown: str
+    error_message: str = ""
+
+
+class FakeCrawler:
+    """Drop-in for crawl4ai's AsyncWebCrawler that returns a generated page"""
+    latency = 0.8
+    startup_latency = 0.5
+    page_paragraphs = 40
+
+    async def __aenter__(self) -> "FakeCrawler":
+        await asyncio.sleep(self.startup_latency)
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        pass
+
+    async def arun(self, url: str, **kwargs: Any) -> FakeCrawlResult:
+        count("page_loads")
+        await asyncio.sleep(self.latency)
+        sections = []
+        for i in range(self.page_paragraphs):
+            sections.append(
+                f"## Section {i}\n\n" + " ".join(FILLER) + f" Opening hours {i} to {i + 8}."
+            )
+        return FakeCrawlResult(success=True, markdown=f"# {url}\n\n" + "\n\n".join(sections))
+
+
+@dataclass
+class MessageRecord:
+    """Timings of one simulated guest message"""
+    started: float = field(default_factory=time.perf_counter)
+    first_visible: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[str] = None
+    counters: Dict[str, int] = field(default_factory=dict)
+
+
+class RecordingEmitter(BaseChainlitEmitter):
+    """Chainlit emitter that discards UI events but notes when the guest first sees a reply"""
+
+    def __init__(self, session: Any):
+        super().__init__(session)
+        self.current: Optional[MessageRecord] = None
+
+    def _visible(self, step_dict: Dict[str, Any]) -> None:
+        if self.current is not None and self.current.first_visible is None:
+            if step_dict.get("type") == "assistant_message" and step_dict.get("output"):
+                self.current.first_visible = time.perf_counter()
+
+    async def stream_start(self, step_dict: Any) -> None:
+        self._visible(step_dict)
+
+    async def send_step(self, step_dict: Any) -> None:
+        self._visible(step_dict)
@@ -0,0 +1,306 @@
+"""Offline end-to-end benchmark of the Chainlit message handler.
+
+Every model is replaced by a scripted FakeLLM and SerpAPI and the crawler by
+local stand-ins, then N simulated sessions send their messages concurrently
+through src.app.main (or straight into the supervisor agent's run_stream).
+
+    python -m benchmarks.run --sessions 20 --messages 4 --save benchmarks/baseline.json
+    python -m benchmarks.run --sessions 20 --messages 4 --compare benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+# The agents build their OpenAI clients at import time, a key is needed but never used
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("SERPAPI_API_KEY", "benchmark")
+# The fakes stand in for the models, loading the real client would only skew memory
+os.environ.setdefault("PRELOAD_AGENTS", "false")
+# Session events are written to a scratch file, so the write-behind log is part of what is measured
+os.environ.setdefault(
+    "EVENT_LOG_DB", os.path.join(tempfile.mkdtemp(prefix="hotel-bench-"), "events.db")
+)
+
+from benchmarks.fakes import (  # noqa: E402
+    FakeCrawler,
+    FakeLLM,
+    FakeSerpApi,
+    MessageRecord,
+    ModelProfile,
+    RecordingEmitter,
+    current_counters,
+)
+
+# Guest messages the sessions cycle through: single intents take the router's fast path,
+# the others go through the supervisor
+WORKLOAD = [
+    "Could I get some extra towels please",
+    "I'd like to order a cheeseburger to my room",
+    "Can you recommend a good italian restaurant nearby",
+    "The air conditioning is not working",
+    "Please bring two pillows and book a table at a sushi place",
+    "What are the opening hours of the museum and can I order a salad",
+]
+
+# Metrics where a higher value is a regression
+LOWER_IS_BETTER = [
+    "latency_p50", "latency_p95", "latency_p99", "first_visible_p50", "first_visible_p95",
+    "model_calls_per_message", "tokens_per_message", "peak_rss_mb",
+]
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(share * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def install_fakes(profile: ModelProfile, stack: contextlib.ExitStack, rpm: int, tpm: int) -> None:
+    from src.agents.concierge_agent import get_concierge_agent
+    from src.agents.maintenance_agent import get_maintenance_agent
+    from src.agents.room_service_agent import get_room_service_agent
+    from src.agents.supervisor_agent import get_supervisor_agent
+    from src.services.admission import AdmittedModel, TokenBucket, admission_controller
+    from src.services.browser_pool import browser_pool
+    from src.services.memory import get_summary_agent
+    from src.services.metrics import InstrumentedModel
+
+    agents = {
+        "supervisor": get_supervisor_agent,
+        "concierge": get_concierge_agent,
+        "room_service": get_room_service_agent,
+        "maintenance": get_maintenance_agent,
+        "summary": get_summary_agent,
+    }
+    for name, get_agent in agents.items():
+        # Keep the wrappers so the benchmark also exercises admission control and instrumentation
+        model = AdmittedModel(InstrumentedModel(FakeLLM(name, profile).model, agent=name))
+        stack.enter_context(get_agent().override(model=model))
+    admission_controller.requests = TokenBucket(rpm)
+    admission_controller.tokens = TokenBucket(tpm)
+    browser_pool.crawler_factory = FakeCrawler
+
+
+async def run_session(index: int, messages: List[str], direct: bool) -> List[MessageRecord]:
+    import chainlit as cl
+    from chainlit.context import init_http_context
+
+    from src import app
+    from src.agents.supervisor_agent import get_supervisor_agent
+    from src.models.hotel_models import HotelDeps, RunEnded
+    from src.services.hotel_registry import hotel_registry
+    from src.services.session_state import SessionState
+
+    # Every task has its own context, so each simulated session gets its own Chainlit session
+    context = init_http_context()
+    emitter = RecordingEmitter(context.session)
+    context.emitter = emitter
+    if not direct:
+        await app.start()
+
+    records = []
+    for text in messages:
+        record = MessageRecord()
+        emitter.current = record
+        current_counters.set(record.counters)
+        try:
+            if direct:
+                deps = HotelDeps(
+                    room_number=str(100 + index),
+                    guest_name="Benchmark Guest",
+                    hotel_location=hotel_registry.get().location,
+                    session_id=context.session.id,
+                )
+                try:
+                    run = get_supervisor_agent().run_stream(
+                        text, deps=deps, usage_limits=app.usage_limits
+                    )
+                    async with run as result:
+                        async for _ in result.stream_structured(debounce_by=None):
+                            if record.first_visible is None:
+                                record.first_visible = time.perf_counter()
+                        record.counters["tokens"] = result.usage().total_tokens or 0
+                except RunEnded as ended:
+                    # A single delegation's result was passed through to the guest
+                    record.first_visible = time.perf_counter()
+                    record.counters["tokens"] = ended.usage.total_tokens or 0
+            else:
+                # Tokens are read from the session's own usage counters
+                state = SessionState(context.session.id)
+                before = await state.store.get(state.key("usage")) or {}
+                await app.main(cl.Message(content=text))
+                after = await state.store.get(state.key("usage")) or {}
+                tokens = after.get("total_tokens", 0) - before.get("total_tokens", 0)
+                record.counters["tokens"] = tokens
+        except Exception as e:
+            record.error = f"{type(e).__name__}: {e}"
+        record.finished = time.perf_counter()
+        records.append(record)
+    return records
+
+
+async def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    from src.services import lifecycle
+
+    serpapi = FakeSerpApi(latency=args.search_latency)
+    await serpapi.start()
+    os.environ["SERPAPI_URL"] = serpapi.url
+    FakeCrawler.latency = args.crawl_latency
+
+    profile = ModelProfile(
+        first_token_latency=args.first_token_latency,
+        chunk_latency=args.chunk_latency,
+        reply_words=args.reply_words,
+    )
+    with contextlib.ExitStack() as stack:
+        install_fakes(profile, stack, args.rpm, args.tpm)
+        await lifecycle.startup()
+        try:
+            started = time.perf_counter()
+            sessions = await asyncio.gather(*[
+                run_session(
+                    index,
+                    [WORKLOAD[(index + i) % len(WORKLOAD)] for i in range(args.messages)],
+                    args.direct,
+                )
+                for index in range(args.sessions)
+            ])
+            elapsed = time.perf_counter() - started
+        finally:
+            await lifecycle.shutdown()
+            await serpapi.close()
+
+    records = [record for session in sessions for record in session]
+    completed = [record for record in records if record.error is None]
+    latencies = [record.finished - record.started for record in completed]
+    first_visible = [
+        record.first_visible - record.started for record in completed if record.first_visible
+    ]
+    messages = len(completed) or 1
+    return {
+        "config": {
+            "sessions": args.sessions,
+            "messages": args.messages,
+            "direct": args.direct,
+            "first_token_latency": args.first_token_latency,
+            "chunk_latency": args.chunk_latency,
+            "reply_words": args.reply_words,
+            "search_latency": args.search_latency,
+            "crawl_latency": args.crawl_latency,
+            "rpm": args.rpm,
+            "tpm": args.tpm,
+        },
+        "metrics": {
+            "messages": len(records),
+            "errors": len(records) - len(completed),
+            "latency_p50": percentile(latencies, 0.50),
+            "latency_p95": percentile(latencies, 0.95),
+            "latency_p99": percentile(latencies, 0.99),
+            "first_visible_p50": percentile(first_visible, 0.50),
+            "first_visible_p95": percentile(first_visible, 0.95),
+            "throughput_per_s": len(completed) / elapsed if elapsed else 0.0,
+            "model_calls_per_message": (
+                sum(r.counters.get("model_calls", 0) for r in completed) / messages
+            ),
+            "tokens_per_message": sum(r.counters.get("tokens", 0) for r in completed) / messages,
+            "page_loads": sum(r.counters.get("page_loads", 0) for r in records),
+            "search_requests": serpapi.requests,
+            # ru_maxrss is in kilobytes on Linux
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        "errors": sorted({record.error for record in records if record.error}),
+    }
+
+
+def compare(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float,
+    lower_is_better: List[str] = LOWER_IS_BETTER,
+) -> List[str]:
+    """Print the change of every metric and return the ones that regressed beyond tolerance"""
+    regressions = []
+    print(f"\n{'metric':<26}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, value in report["metrics"].items():
+        old = baseline["metrics"].get(name)
+        if old is None:
+            continue
+        if old:
+            change = (value - old) / old
+        else:
+            # Anything appearing where the baseline had none is a regression of its own
+            change = float("inf") if value > old and name in lower_is_better else 0.0
+        print(f"{name:<26}{old:>12.3f}{value:>12.3f}{change:>+10.1%}")
+        worse = change > tolerance if name in lower_is_better else (
+            name == "throughput_per_s" and change < -tolerance
+        )
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end benchmark with fake models and APIs"
+    )
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent simulated sessions")
+    parser.add_argument("--messages", type=int, default=3, help="messages sent by each session")
+    parser.add_argument(
+        "--direct", action="store_true", help="drive the supervisor's run_stream instead of main"
+    )
+    parser.add_argument("--first-token-latency", type=float, default=0.25, help="seconds")
+    parser.add_argument(
+        "--chunk-latency", type=float, default=0.002, help="seconds per streamed token"
+    )
+    parser.add_argument("--reply-words", type=int, default=40, help="words in each model reply")
+    parser.add_argument(
+        "--search-latency", type=float, default=0.3, help="seconds per SerpAPI call"
+    )
+    parser.add_argument("--crawl-latency", type=float, default=0.8, help="seconds per page load")
+    parser.add_argument(
+        "--rpm", type=int, default=0, help="admission requests per minute, 0 for unlimited"
+    )
+    parser.add_argument(
+        "--tpm", type=int, default=0, help="admission tokens per minute, 0 for unlimited"
+    )
+    parser.add_argument("--verbose", action="store_true", help="show the app's own output")
+    parser.add_argument(
+        "--metrics", action="store_true", help="print the Prometheus metrics at the end"
+    )
+    parser.add_argument("--save", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+        report = asyncio.run(benchmark(args))
+    print(json.dumps(report, indent=2))
+    if args.metrics:
+        from src.services import metrics
+
+        print(metrics.render())
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nRegressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Cold start profile of the app: how long importing it takes and where the time goes.
+
+Every run imports src.app in a fresh interpreter under -X importtime, then
+builds the agents and resolves their models, which is what the first guest
+message pays for on top.
+
+    python -m benchmarks.startup --runs 5 --save benchmarks/startup_baseline.json
+    python -m benchmarks.startup --runs 5 --compare benchmarks/startup_baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from benchmarks.run import compare
+
+# Packages that should only be loaded once a guest needs them. aiohttp is not among them:
+# the app's own client defers it, but Chainlit's engineio imports it regardless.
+DEFERRED_PACKAGES = ["crawl4ai", "playwright", "openai"]
+
+# Metrics where a higher value is a regression
+LOWER_IS_BETTER = [
+    "import_seconds", "agents_build_seconds", "eager_heavy_imports", "modules_imported",
+]
+
+# Runs in the fresh interpreter, the report is the last line of its output
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import src.app
+imported = time.perf_counter()
+eager = [name for name in {DEFERRED_PACKAGES!r} if name in sys.modules]
+modules = len(sys.modules)
+
+from src.agents.router import SPECIALISTS
+from src.agents.supervisor_agent import get_supervisor_agent
+agents = [get_agent() for get_agent in [get_supervisor_agent, *SPECIALISTS.values()]]
+built = time.perf_counter()
+for agent in agents:
+    agent.model.model_name  # resolves the wrapped provider model
+resolved = time.perf_counter()
+
+print(json.dumps({{
+    "import_seconds": imported - started,
+    "agents_build_seconds": built - imported,
+    "model_resolve_seconds": resolved - built,
+    "modules_imported": modules,
+    "eager": eager,
+}}))
+"""
+
+
+def parse_importtime(stderr: str, until: str = "src.app") -> Dict[str, Dict[str, int]]:
+    """Self and cumulative microseconds per module from -X importtime output.
+
+    A module is listed once its imports are done, so everything up to the line
+    of until was imported by it; what follows was loaded by building the agents.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = {"self": int(self_us), "cumulative": int(cumulative_us)}
+        if name.strip() == until:
+            break
+    return modules
+
+
+def profile_once() -> Dict[str, Any]:
+    env = dict(os.environ)
+    # The OpenAI client is created when the models are resolved, a key is needed but never used
+    env.setdefault("OPENAI_API_KEY", "startup-profile")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["modules"] = parse_importtime(process.stderr)
+    return result
+
+
+def summarize(runs: List[Dict[str, Any]], top: int) -> Dict[str, Any]:
+    """Median of every timing, import time by top-level package and of the app's own modules"""
+    by_package: Dict[str, List[float]] = defaultdict(list)
+    own_modules: Dict[str, List[float]] = defaultdict(list)
+    for run in runs:
+        packages: Dict[str, int] = defaultdict(int)
+        for name, times in run["modules"].items():
+            packages[name.split(".")[0]] += times["self"]
+            if name.startswith("src."):
+                own_modules[name].append(times["cumulative"] / 1e6)
+        for package, self_us in packages.items():
+            by_package[package].append(self_us / 1e6)
+
+    def median_ranking(values: Dict[str, List[float]]) -> Dict[str, float]:
+        medians = {name: statistics.median(times) for name, times in values.items()}
+        return dict(sorted(medians.items(), key=lambda item: -item[1])[:top])
+
+    return {
+        "metrics": {
+            "import_seconds": statistics.median(run["import_seconds"] for run in runs),
+            "agents_build_seconds": statistics.median(run["agents_build_seconds"] for run in runs),
+            "model_resolve_seconds": statistics.median(
+                run["model_resolve_seconds"] for run in runs
+            ),
+            "modules_imported": statistics.median(run["modules_imported"] for run in runs),
+            "eager_heavy_imports": len(runs[-1]["eager"]),
+        },
+        "eager_heavy_imports": runs[-1]["eager"],
+        "packages_seconds": median_ranking(by_package),
+        "app_modules_seconds": median_ranking(own_modules),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import-time breakdown of the app's cold start")
+    parser.add_argument(
+        "--runs", type=int, default=3, help="fresh interpreters to take the median of"
+    )
+    parser.add_argument("--top", type=int, default=15, help="packages and modules listed")
+    parser.add_argument("--save", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    report = summarize([profile_once() for _ in range(args.runs)], args.top)
+    print(json.dumps(report, indent=2))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance, LOWER_IS_BETTER)
+        if regressions:
+            print(f"\nRegressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,84 @@
-from datetime import date
+from functools import lru_cache
 from pydantic_ai import Agent, RunContext
 from typing import Union, List, Dict
 
 from src.models.hotel_models import TaskResponse, Failed, HotelDeps
 from src.agents.tools.web_search import web_search as web_search_tool
 from src.agents.tools.get_website import get_website as get_website_tool
-# Define the concierge agent with a more personable approach
-concierge_agent = Agent(
-    'openai:gpt-4o',
-    deps_type=HotelDeps,
-    result_type=Union[TaskResponse, Failed],
-    system_prompt=(
-        'You are Michael, the knowledgeable and charming Concierge with extensive local expertise. '
-        'Your passion is creating memorable experiences for guests through personalized recommendations.\n\n'
-
-        'You have access to a web search tool that can find information about:\n'
-        '- Restaurants and dining options\n'
-        '- Local attractions and activities\n'
-        '- Entertainment venues\n'
-        '- Cultural sites and events\n'
-        '- Shopping areas\n'
-        '- Transportation services\n\n'
-
-        'You have access to a get website tool that can get the website of a given url.\n\n'
-
-        'When responding to guests:\n'
-        '1. Use the search tool to find current, relevant information\n'
-        '2. Provide personalized recommendations based on their preferences\n'
-        '3. Include practical details like location, ratings, and pricing\n'
-        '4. Offer to make reservations or arrangements when appropriate\n'
-        '5. Be warm and enthusiastic in your communication\n\n'
-
-        'Always format your responses as a TaskResponse with:\n'
-        '- status: "completed" for successful responses\n'
-        '- message: your detailed recommendation or response\n'
-        '- eta: "immediate" for information, or estimated time for arrangements\n\n'
-
-        'If you encounter any issues, return a Failed response with a clear reason.'
-    ),
-)
-
-@concierge_agent.system_prompt
-def add_hotel_location(ctx: RunContext[HotelDeps]) -> str:
-    return f'The hotel is located in {ctx.deps.hotel_location.full_address}.\n\n'
+from src.services.cancellation import with_deadline
+from src.services.compaction import compacted
+from src.services.model_tiers import model_tiers
+from src.services.metrics import TOOL_SECONDS, Track
+from src.services.prompts import prompt_library
 
-@concierge_agent.system_prompt
-def add_the_date() -> str:
-    return f'The date is {date.today()}.'
+# Concierge service categories with the words guests typically use for them
+CONCIERGE_CATEGORIES: Dict[str, List[str]] = {
+    "dining": [
+        "restaurant", "dinner", "lunch", "cafe", "bar", "italian", "sushi", "cuisine", "eat out",
+    ],
+    "attractions": [
+        "attraction", "sightseeing", "tour", "visit", "activity", "things to do", "park",
+    ],
+    "entertainment": ["theater", "theatre", "cinema", "concert", "club", "nightlife", "show"],
+    "culture": ["museum", "gallery", "exhibition", "event", "festival", "church", "history"],
+    "shopping": ["shop", "shopping", "mall", "store", "market", "pharmacy", "souvenir"],
+    "transportation": [
+        "taxi", "cab", "train", "airport", "bus", "transfer", "directions", "parking",
+    ],
+    "information": ["opening hours", "weather", "sightseeing tips"],
+}
 
-@concierge_agent.tool
 async def web_search(ctx: RunContext[HotelDeps], query: str) -> List[Dict]:
     """Search the web for local information based on the query"""
-    return await web_search_tool(ctx, query)
+    with Track("tool", "web_search", TOOL_SECONDS):
+        return await web_search_tool(ctx, query)
+
+async def get_website(ctx: RunContext[HotelDeps], url: str, question: str = "") -> str:
+    """Get the parts of the website defined by url that are relevant to the question"""
+    with Track("tool", "get_website", TOOL_SECONDS):
+        return await get_website_tool(ctx, url, question)
+
+CONCIERGE_INSTRUCTIONS = (
+    'You are Michael, the knowledgeable and charming Concierge with extensive local expertise. '
+    'Your passion is creating memorable experiences for guests through personalized recommendations.\n\n'
+
+    'You have access to a web search tool that can find information about:\n'
+    '- Restaurants and dining options\n'
+    '- Local attractions and activities\n'
+    '- Entertainment venues\n'
+    '- Cultural sites and events\n'
+    '- Shopping areas\n'
+    '- Transportation services\n\n'
+
+    'You have access to a get website tool that can get the website of a given url. '
+    'Pass the question you want answered so only the relevant parts of the page are returned.\n\n'
+
+    'When responding to guests:\n'
+    '1. Use the search tool to find current, relevant information\n'
+    '2. Provide personalized recommendations based on their preferences\n'
+    '3. Include practical details like location, ratings, and pricing\n'
+    '4. Offer to make reservations or arrangements when appropriate\n'
+    '5. Be warm and enthusiastic in your communication\n\n'
+
+    'Always format your responses as a TaskResponse with:\n'
+    '- status: "completed" for successful responses\n'
+    '- message: your detailed recommendation or response\n'
+    '- eta: "immediate" for information, or estimated time for arrangements\n\n'
+
+    'If you encounter any issues, return a Failed response with a clear reason.'
+)
+prompt_library.register('concierge', CONCIERGE_INSTRUCTIONS)
 
-@concierge_agent.tool
-async def get_website(ctx: RunContext[HotelDeps], url: str) -> str:
-    """Get the website defined by url"""
-    return await get_website_tool(ctx, url)
+@lru_cache(maxsize=None)
+def get_concierge_agent() -> Agent[HotelDeps, Union[TaskResponse, Failed]]:
+    """The concierge agent with a more personable approach, built on first use"""
+    agent = Agent(
+        model_tiers.model('concierge'),
+        name='concierge',
+        deps_type=HotelDeps,
+        result_type=Union[TaskResponse, Failed],
+    )
+    agent.system_prompt(dynamic=True)(prompt_library.system_prompt('concierge'))
+    agent.tool(compacted(with_deadline(web_search)))
+    agent.tool(compacted(with_deadline(get_website)))
+    return agent
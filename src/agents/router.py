@@ -0,0 +1,183 @@
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, Collection, Dict, List, Optional
+
+from pydantic_ai import Agent
+
+from src.agents.concierge_agent import CONCIERGE_CATEGORIES, get_concierge_agent
+from src.agents.maintenance_agent import get_maintenance_agent
+from src.agents.room_service_agent import get_room_service_agent
+from src.services.hotel_registry import Hotel
+from src.services.menu_catalog import MenuCatalog
+from src.services.service_matcher import ServiceMatcher
+from src.services.text import keyword, tokenize
+
+# Minimum confidence the best specialist needs to skip the supervisor.
+# Set above 1 to always go through the supervisor.
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.8"))
+# Longer messages usually carry several requests or need context, leave them to the supervisor
+ROUTER_MAX_WORDS = int(os.getenv("ROUTER_MAX_WORDS", "25"))
+# Share of the message's content words the chosen service's vocabulary has to cover
+ROUTER_MIN_COVERAGE = float(os.getenv("ROUTER_MIN_COVERAGE", "0.5"))
+
+# Words that carry no intent and should not become keywords
+STOPWORDS = {
+    "a", "an", "and", "any", "all", "or", "the", "with", "of", "on", "in", "to", "for", "side",
+    "style", "two", "fresh", "freshly", "option", "available", "choice", "type",
+}
+
+# Where a message may start another request: conjunctions and punctuation
+CLAUSE_BREAK = re.compile(r"[,;.!?]+|\b(?:and|also|plus|then|but)\b", re.IGNORECASE)
+# Words that carry no request of their own, they neither need nor count as coverage
+FILLER = STOPWORDS | {
+    "i", "d", "m", "me", "my", "we", "you", "it", "is", "are", "be", "can", "could", "would",
+    "will", "please", "thank", "thanks", "hi", "hello", "like", "want", "need", "get", "some",
+    "this", "that", "there", "here", "too", "well", "just", "now", "so", "at", "by",
+}
+
+# Generic words per service that are not derived from the catalogs. They hint at a service
+# but are not specific enough to route on their own.
+SERVICE_WORDS = {
+    "room_service": ["order", "menu", "hungry", "room service", "food", "snack", "drink", "meal"],
+    "maintenance": ["light", "shower", "bathroom", "window", "door"],
+    "concierge": ["recommend", "nearby", "near", "website", "information"],
+}
+# Weight of a generic word compared to a catalog keyword
+GENERIC_WEIGHT = 0.6
+
+
+@dataclass
+class Route:
+    """Result of classifying a guest message"""
+    service: Optional[str]  # room_service, maintenance, concierge or None for the supervisor
+    confidence: float
+    matches: List[str]
+
+
+class IntentRouter:
+    """Keyword based classifier sending obvious single-intent messages straight to a specialist"""
+
+    def __init__(
+        self,
+        vocabularies: Dict[str, Dict[str, float]],
+        threshold: float = ROUTER_CONFIDENCE_THRESHOLD
+    ):
+        self.threshold = threshold
+        self.vocabularies = vocabularies
+        self.max_phrase_words = max(
+            (len(kw.split()) for vocabulary in vocabularies.values() for kw in vocabulary),
+            default=1,
+        )
+
+    def classify(self, text: str) -> Route:
+        words = tokenize(text)
+        if not words or len(words) > ROUTER_MAX_WORDS:
+            return Route(service=None, confidence=0.0, matches=[])
+
+        # All phrases of up to max_phrase_words consecutive words
+        grams = {
+            " ".join(words[i:i + n])
+            for n in range(1, self.max_phrase_words + 1)
+            for i in range(len(words) - n + 1)
+        }
+
+        hits = {
+            service: {kw: vocabulary[kw] for kw in grams if kw in vocabulary}
+            for service, vocabulary in self.vocabularies.items()
+        }
+        scores = {service: sum(matches.values()) for service, matches in hits.items()}
+        total = sum(scores.values())
+        if not total:
+            return Route(service=None, confidence=0.0, matches=[])
+
+        service = max(scores, key=scores.get)
+        matches = sorted(hits[service])
+
+        # Catalog keywords for more than one service means a multi-intent message
+        specific = [
+            name for name, matched in hits.items() if any(w == 1.0 for w in matched.values())
+        ]
+        if len(specific) > 1:
+            return Route(service=None, confidence=0.0, matches=matches)
+
+        # Share of the evidence, discounted when only generic words matched
+        confidence = scores[service] / total * max(hits[service].values())
+        if confidence < self.threshold or not self._covers(text, words, service):
+            return Route(service=None, confidence=confidence, matches=matches)
+        return Route(service=service, confidence=confidence, matches=matches)
+
+    def _covers(self, text: str, words: List[str], service: str) -> bool:
+        """Whether the service's vocabulary accounts for the whole message.
+
+        Words no vocabulary knows ("... and I want a burger") may be a second request,
+        so every clause needs one of the service's catalog keywords and most content
+        words have to be part of a matched keyword.
+        """
+        vocabulary = self.vocabularies[service]
+        catalog = {kw for kw, weight in vocabulary.items() if weight == 1.0}
+        for clause in CLAUSE_BREAK.split(text):
+            clause_words = tokenize(clause)
+            content = [word for word in clause_words if word not in FILLER]
+            if content and not any(self._matched(clause_words, catalog)):
+                return False
+
+        covered = self._matched(words, vocabulary)
+        content = [hit for word, hit in zip(words, covered, strict=False) if word not in FILLER]
+        return not content or sum(content) / len(content) >= ROUTER_MIN_COVERAGE
+
+    def _matched(self, words: List[str], keywords: Collection[str]) -> List[bool]:
+        """For each word, whether it is part of one of the keywords found in words"""
+        covered = [False] * len(words)
+        for n in range(1, self.max_phrase_words + 1):
+            for i in range(len(words) - n + 1):
+                if " ".join(words[i:i + n]) in keywords:
+                    covered[i:i + n] = [True] * n
+        return covered
+
+
+def build_vocabularies(menu: MenuCatalog, services: ServiceMatcher) -> Dict[str, Dict[str, float]]:
+    """Each specialist's vocabulary from the menu, service catalog and concierge categories"""
+    # Only whole item names are specific, the words of names, categories and descriptions
+    # ("late", "night", "main", "seasonal", ...) also turn up in requests for other services
+    menu_names = set()
+    menu_words = set()
+    for item in menu.items:
+        for text in [item["name"], item["category"].replace("_", " "), item["description"]]:
+            menu_words.update(
+                word for word in tokenize(text) if word not in STOPWORDS and not word.isdigit()
+            )
+        menu_names.add(keyword(item["name"]))
+
+    catalog_words = {
+        "room_service": menu_names,
+        "maintenance": {keyword(word) for word in services.keywords},
+        "concierge": {keyword(word) for words in CONCIERGE_CATEGORIES.values() for word in words},
+    }
+    generic_words = {
+        "room_service": [*SERVICE_WORDS["room_service"], *menu_words],
+        "maintenance": SERVICE_WORDS["maintenance"],
+        "concierge": SERVICE_WORDS["concierge"],
+    }
+
+    vocabularies = {}
+    for service, words in catalog_words.items():
+        vocabulary = {keyword(word): GENERIC_WEIGHT for word in generic_words[service]}
+        vocabulary.update({word: 1.0 for word in words})
+        vocabularies[service] = vocabulary
+    return vocabularies
+
+
+# Getters of the specialist agents, which are built on first use
+SPECIALISTS: Dict[str, Callable[[], Agent]] = {
+    "room_service": get_room_service_agent,
+    "maintenance": get_maintenance_agent,
+    "concierge": get_concierge_agent,
+}
+
+
+def router_for(hotel: Hotel) -> IntentRouter:
+    """Intent router of the property, its vocabulary follows the property's menu and services"""
+    return hotel.artifact(
+        "intent_router", lambda: IntentRouter(build_vocabularies(hotel.menu, hotel.services))
+    )
@@ -1,106 +1,178 @@
-from datetime import date
+import asyncio
+import os
+import re
+from functools import lru_cache
 from pydantic_ai import Agent, RunContext
-from typing import Union, List, Dict
-import chainlit as cl
-
-from src.models.hotel_models import HotelRequest, TaskResponse, Failed, HotelDeps
-from src.agents.room_service_agent import room_service_agent
-from src.agents.concierge_agent import concierge_agent
-from src.agents.maintenance_agent import maintenance_agent
-from src.agents.tools.user_input import get_user_input
-# Keep track of processed requests to avoid duplicates
-processed_requests: Dict[str, bool] = {}
-
-def reset_processed_requests():
-    """Reset the processed requests dictionary."""
-    processed_requests.clear()
-
-# Define the supervisor agent with a warmer, more personable prompt
-supervisor_agent = Agent(
-    'openai:gpt-4o',
-    deps_type=HotelDeps,
-    result_type=Union[TaskResponse, Failed],
-    system_prompt=(
-        'You are Sofia, the warm and attentive Hotel Concierge Manager with 15 years of luxury hospitality experience. '
-        'Your goal is to make every guest feel special and well-cared for.\n\n'
-
-        'When handling multiple requests in a single message:\n'
-        '1. Identify each distinct request\n'
-        '2. Process them separately using appropriate specialized agents\n'
-        '3. Combine the responses into a single coherent message\n'
-        '4. If some requests succeed and others fail, include both in your response\n\n'
-
-        'Request Categories:\n'
-        '1. "room_service": Food and beverage orders\n'
-        '2. "concierge": Local recommendations, arrangements, information requests, website checks\n'
-        '3. "maintenance": Room supplies and services\n\n'
-
-        'For each request:\n'
-        '1. Identify the request type\n'
-        '2. Create a detailed HotelRequest\n'
-        '3. Delegate to appropriate agent\n'
-        '4. Handle the response appropriately\n\n'
-
-        'Important Notes:\n'
-        '- Website checks and information requests should be handled by the concierge agent\n'
-        '- When guests ask about specific venues or websites, treat it as a concierge request\n'
-        '- For any local information or online checks, delegate to the concierge agent\n\n'
-
-        'Always format your final response as a TaskResponse with:\n'
-        '- status: "completed" if ANY request succeeded, "failed" if ALL failed\n'
-        '- message: Combined response addressing all requests\n'
-        '- eta: Longest estimated time from successful requests\n\n'
-
-        'If all requests fail, return a Failed response with clear reasons for each failure.'
-    ),
+from pydantic_ai.messages import (
+    ModelMessage, ModelRequest, ModelResponse, ToolCallPart, UserPromptPart
 )
+from typing import Union, List
+import chainlit as cl
 
-@supervisor_agent.system_prompt
-def add_hotel_location(ctx: RunContext[HotelDeps]) -> str:
-    return f'The hotel is located in {ctx.deps.hotel_location.full_address}.\n\n'
+from src.models.hotel_models import HotelRequest, TaskResponse, Failed, HotelDeps, RunEnded
+from src.agents.room_service_agent import get_room_service_agent
+from src.agents.concierge_agent import get_concierge_agent
+from src.agents.maintenance_agent import get_maintenance_agent
+from src.agents.tools.user_input import get_user_input, sole_tool_call
+from src.services.idempotency import idempotency_store
+from src.services.admission import prioritized, priority_for
+from src.services.cancellation import with_deadline
+from src.services.compaction import compacted
+from src.services.event_log import event_log
+from src.services.model_tiers import model_tiers
+from src.services.metrics import AGENT_RUN_SECONDS, DELEGATION_SECONDS, run_usage, Track
+from src.services.prompts import prompt_library, with_context
 
-@supervisor_agent.system_prompt
-def add_the_date() -> str:
-    return f'The date is {date.today()}.'
+# Request types with their own specialist, anything else is reported as "other" in the metrics
+SERVICES = ("room_service", "concierge", "maintenance")
 
-@supervisor_agent.tool
-async def get_user_input(ctx: RunContext[HotelDeps], query: str):
-    return await get_user_input(query)
+# When a turn delegated a single request and it succeeded, the specialist's result goes to the guest
+# as is, instead of the supervisor taking another turn to restate it
+SUPERVISOR_PASSTHROUGH = os.getenv("SUPERVISOR_PASSTHROUGH", "true").lower() in ("1", "true", "yes")
+# Wording of a passed through result in Sofia's voice, with {message}, {eta} and {guest_name}
+SUPERVISOR_PASSTHROUGH_TEMPLATE = os.getenv("SUPERVISOR_PASSTHROUGH_TEMPLATE", "{message}")
+# Reply to a request the guest already made in this session, whichever path it came through
+DUPLICATE_REQUEST = (
+    "I've already processed this request. "
+    "Would you like to make any modifications or try something else?"
+)
 
-@supervisor_agent.tool
 async def delegate_task(
     ctx: RunContext[HotelDeps],
     request: HotelRequest
 ) -> Union[TaskResponse, Failed]:
     """Delegate a task to the appropriate specialized agent"""
-    try:
-        # Create a unique key for this request
-        request_key = f"{request['request_type']}:{request['description']}"
+    result = await run_delegation(ctx, request)
+    pass_through(ctx, result)
+    return result
+
+async def delegate_tasks(
+    ctx: RunContext[HotelDeps],
+    requests: List[HotelRequest]
+) -> Union[TaskResponse, Failed]:
+    """Delegate several independent tasks at once, the specialized agents handle them in parallel"""
+    if not requests:
+        return Failed(reason="No requests were provided")
+
+    # Every branch shares ctx.usage, so the usage limits still cover the whole turn
+    results = await asyncio.gather(*(run_delegation(ctx, request) for request in requests))
+    result = merge_responses(list(results))
+    pass_through(ctx, result)
+    return result
+
+def delegations_this_run(messages: List[ModelMessage]) -> int:
+    """Requests delegated since the guest's message, those of the current model response included"""
+    count = 0
+    for message in reversed(messages):
+        if isinstance(message, ModelRequest) and any(
+            isinstance(part, UserPromptPart) for part in message.parts
+        ):
+            break
+        if isinstance(message, ModelResponse):
+            for part in message.parts:
+                if isinstance(part, ToolCallPart) and part.tool_name == "delegate_task":
+                    count += 1
+                elif isinstance(part, ToolCallPart) and part.tool_name == "delegate_tasks":
+                    count += max(len(part.args_as_dict().get("requests") or []), 1)
+    return count
 
-        # Check if we've already processed this request
-        if request_key in processed_requests:
-            return Failed(reason=f"I've already processed this request. Would you like to make any modifications or try something else?")
+def pass_through(ctx: RunContext[HotelDeps], result: Union[TaskResponse, Failed]) -> None:
+    """End the supervisor run with result if it is the only one of the turn and succeeded.
 
-        # Mark this request as processed
-        processed_requests[request_key] = True
+    Failures and turns with several delegations go back to the supervisor, which
+    explains the failure or merges the results. So do delegations called next to
+    other tools, which would keep running after the run ended.
+    """
+    if not SUPERVISOR_PASSTHROUGH or "reason" in result or delegations_this_run(ctx.messages) != 1:
+        return
+    if not sole_tool_call(ctx):
+        return
+    message = SUPERVISOR_PASSTHROUGH_TEMPLATE.format(
+        message=result.get("message", ""), eta=result.get("eta", ""), guest_name=ctx.deps.guest_name
+    )
+    response = TaskResponse(**{**result, "message": message})
+    raise RunEnded(response, run_usage(ctx), list(ctx.messages))
+
+def eta_minutes(eta: str) -> int:
+    """Rough upper bound in minutes of an ETA such as '5-10 minutes' or 'immediate'"""
+    numbers = [int(n) for n in re.findall(r"\d+", eta or "")]
+    if not numbers:
+        return 0
+    minutes = max(numbers)
+    return minutes * 60 if "hour" in eta.lower() else minutes
+
+def merge_responses(results: List[Union[TaskResponse, Failed]]) -> Union[TaskResponse, Failed]:
+    """Merge the results of parallel delegations into a single response"""
+    succeeded = [r for r in results if "reason" not in r]
+    failed = [r for r in results if "reason" in r]
+
+    if not succeeded:
+        return Failed(reason=" ".join(r["reason"] for r in failed))
+
+    message = "\n\n".join(r.get("message", "") for r in succeeded)
+    if failed:
+        message += "\n\nUnfortunately: " + " ".join(r["reason"] for r in failed)
+
+    return TaskResponse(
+        status="completed",
+        message=message,
+        eta=max((r.get("eta", "") for r in succeeded), key=eta_minutes)
+    )
+
+async def run_delegation(
+    ctx: RunContext[HotelDeps],
+    request: HotelRequest
+) -> Union[TaskResponse, Failed]:
+    """Run a single request on the appropriate specialized agent"""
+    request_type = str(request.get('request_type', '')).lower()
+    service = request_type if request_type in SERVICES else "other"
+    scope = idempotency_store.scope(ctx.deps.session_id, ctx.deps.room_number)
+    with Track("delegation", service, DELEGATION_SECONDS):
+        # Marked before the run, so a duplicate sent meanwhile is caught too
+        if not await idempotency_store.first_time(
+            scope, request['request_type'], request['description']
+        ):
+            result = Failed(reason=DUPLICATE_REQUEST)
+        else:
+            try:
+                result = await _run_delegation(ctx, request)
+            except BaseException:
+                # Cancelled or timed out, the guest may ask again
+                await idempotency_store.release(
+                    scope, request['request_type'], request['description']
+                )
+                raise
+            if "reason" in result:
+                await idempotency_store.release(
+                    scope, request['request_type'], request['description']
+                )
+    await event_log.record(
+        ctx.deps.session_id, "delegation", {"request": dict(request), "result": dict(result)}
+    )
+    return result
 
+async def _run_delegation(
+    ctx: RunContext[HotelDeps],
+    request: HotelRequest
+) -> Union[TaskResponse, Failed]:
+    try:
         # Select the appropriate agent based on request type
         request_type = request['request_type'].lower()
         if request_type == "room_service":
-            agent = room_service_agent
+            agent = get_room_service_agent()
             emoji = "🍽️"
             service = "Room Service"
         elif request_type == "concierge" or "website" in request['description'].lower() or "check" in request['description'].lower():
-            agent = concierge_agent
+            agent = get_concierge_agent()
             emoji = "🛎️"
             service = "Concierge"
         elif request_type == "maintenance":
-            agent = maintenance_agent
+            agent = get_maintenance_agent()
             emoji = "🔧"
             service = "Maintenance"
         else:
             # Default to concierge for information and general requests
-            agent = concierge_agent
+            agent = get_concierge_agent()
             emoji = "🛎️"
             service = "Concierge"
 
@@ -109,12 +181,17 @@ async def delegate_task(
             step.input = request['description']
 
             try:
-                # Execute the request with the specialized agent
-                response = await agent.run(
-                    request['description'],
-                    deps=ctx.deps,
-                    usage=ctx.usage,  # Share usage context
-                )
+                # Execute the request with the specialized agent, queued by its own urgency
+                priority = priority_for(request['description'], agent.name, ctx.deps.hotel_id)
+                with Track("agent", agent.name, AGENT_RUN_SECONDS), prioritized(priority):
+                    # Starts on the agent's tier, a stronger model takes over on a poor result
+                    response = await model_tiers.run(
+                        agent,
+                        with_context(request['description'], ctx.deps),
+                        text=request['description'],
+                        deps=ctx.deps,
+                        usage=ctx.usage,  # Share usage context
+                    )
 
                 # Extract the actual response data
                 response_data = response.data
@@ -150,4 +227,54 @@ async def delegate_task(
                 return Failed(reason=f"Error processing {service.lower()} request: {str(e)}")
 
     except Exception as e:
-        return Failed(reason=f"Unexpected error while delegating task: {str(e)}")
\ No newline at end of file
+        return Failed(reason=f"Unexpected error while delegating task: {str(e)}")
+
+SUPERVISOR_INSTRUCTIONS = (
+    'You are Sofia, the warm and attentive Hotel Concierge Manager with 15 years of luxury hospitality experience. '
+    'Your goal is to make every guest feel special and well-cared for.\n\n'
+
+    'When handling multiple requests in a single message:\n'
+    '1. Identify each distinct request\n'
+    '2. Pass all of them in ONE delegate_tasks call so the specialized agents work in parallel\n'
+    '3. Combine the responses into a single coherent message\n'
+    '4. If some requests succeed and others fail, include both in your response\n\n'
+
+    'Request Categories:\n'
+    '1. "room_service": Food and beverage orders\n'
+    '2. "concierge": Local recommendations, arrangements, information requests, website checks\n'
+    '3. "maintenance": Room supplies and services\n\n'
+
+    'For each request:\n'
+    '1. Identify the request type\n'
+    '2. Create a detailed HotelRequest\n'
+    '3. Delegate to appropriate agent (delegate_task for one request, delegate_tasks for several)\n'
+    '4. Handle the response appropriately\n\n'
+
+    'Important Notes:\n'
+    '- Website checks and information requests should be handled by the concierge agent\n'
+    '- When guests ask about specific venues or websites, treat it as a concierge request\n'
+    '- For any local information or online checks, delegate to the concierge agent\n\n'
+
+    'Always format your final response as a TaskResponse with:\n'
+    '- status: "completed" if ANY request succeeded, "failed" if ALL failed\n'
+    '- message: Combined response addressing all requests\n'
+    '- eta: Longest estimated time from successful requests\n\n'
+
+    'If all requests fail, return a Failed response with clear reasons for each failure.'
+)
+prompt_library.register('supervisor', SUPERVISOR_INSTRUCTIONS)
+
+@lru_cache(maxsize=None)
+def get_supervisor_agent() -> Agent[HotelDeps, Union[TaskResponse, Failed]]:
+    """The supervisor agent with a warmer, more personable prompt, built on first use"""
+    agent = Agent(
+        model_tiers.model('supervisor'),
+        name='supervisor',
+        deps_type=HotelDeps,
+        result_type=Union[TaskResponse, Failed],
+    )
+    agent.system_prompt(dynamic=True)(prompt_library.system_prompt('supervisor'))
+    agent.tool(get_user_input)
+    agent.tool(compacted(with_deadline(delegate_task)))
+    agent.tool(compacted(with_deadline(delegate_tasks)))
+    return agent
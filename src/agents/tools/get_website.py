@@ -1,19 +1,58 @@
-from crawl4ai import AsyncWebCrawler
+import os
+from typing import Optional
+
 from pydantic_ai import RunContext
 import chainlit as cl
 
 from src.models.hotel_models import HotelDeps
+from src.services.browser_pool import browser_pool
+from src.services.extraction import extract_relevant
+from src.services.memory import NEW_MESSAGE_HEADER
+from src.services.metrics import register_cache
+from src.services.prompts import without_context
+from src.services.search_cache import SearchCache
+
+# Crawled pages are kept so follow-up questions about the same site need no new fetch
+WEBSITE_CACHE_TTL = float(os.getenv("WEBSITE_CACHE_TTL", "3600"))
+WEBSITE_CACHE_SIZE = int(os.getenv("WEBSITE_CACHE_SIZE", "64"))
+
+page_cache = SearchCache(
+    max_entries=WEBSITE_CACHE_SIZE,
+    ttl=WEBSITE_CACHE_TTL,
+    empty_ttl=WEBSITE_CACHE_TTL,
+    db_path="",
+)
+register_cache("website", page_cache)
+
 
+def guest_message(prompt: str) -> str:
+    """The guest's request in a run's prompt, without the earlier turns and the volatile context"""
+    return without_context(prompt).rpartition(f"{NEW_MESSAGE_HEADER}\n")[2]
 
-async def get_website(ctx: RunContext[HotelDeps], url: str) -> str:
-    """Get the website defined by url"""
+
+async def get_website(ctx: RunContext[HotelDeps], url: str, question: str = "") -> str:
+    """Get the parts of the website defined by url that are relevant to the question"""
     print(f'🔍 Getting website for {url}')
     async with cl.Step(name="Get Website Tool", type="tool") as step:
         step.input = url
-        async with AsyncWebCrawler() as crawler:
-            result = await crawler.arun(
-                url=url,
-            )
-            print(result.markdown)
-            step.output = result.markdown
-        return result.markdown
\ No newline at end of file
+
+        async def fetch() -> Optional[str]:
+            # Borrow a warm browser instead of launching one per call
+            result = await browser_pool.fetch(url)
+            if not result.success:
+                step.output = f"Could not load {url}: {result.error_message}"
+                return None
+            return result.markdown or ""
+
+        markdown, cached = await page_cache.get_or_fetch(url, fetch)
+        if markdown is None:
+            return f"The website {url} could not be loaded."
+
+        # Only the chunks that answer the question go to the model
+        # Without a question, the guest's request picks them, not the date, name and room after it
+        content = extract_relevant(markdown, question or guest_message(ctx.prompt or ""))
+        print(f'📄 {url}: {len(markdown)} chars crawled, {len(content)} chars kept')
+        step.output = content
+        if cached:
+            step.name = "Get Website Tool (cached)"
+        return content
@@ -1,12 +1,54 @@
-import chainlit as cl
+from typing import List
+
 from pydantic_ai import RunContext
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    ToolCallPart,
+    ToolReturnPart,
+)
+
+from src.models.hotel_models import HotelDeps, RunSuspended
+from src.services.metrics import run_usage
+
+# Tool result of a question once the guest's reply arrives, the reply itself is their next message
+ANSWERED = "The guest's reply follows as their next message."
+# Tool result of a question asked alongside other tool calls
+ASK_ALONE = (
+    "Not asked. Ask the guest in a response of its own, once the results of the other tools are in."
+)
+
+
+def sole_tool_call(ctx: RunContext[HotelDeps]) -> bool:
+    """Whether the running tool is the only tool call of the model response being handled.
+
+    A tool can only end the run when nothing else runs next to it: pydantic-ai gathers
+    the calls of a response without cancelling the others when one raises.
+    """
+    response = ctx.messages[-1] if ctx.messages else None
+    if not isinstance(response, ModelResponse):
+        return False
+    return sum(isinstance(part, ToolCallPart) for part in response.parts) == 1
+
 
-from src.models.hotel_models import HotelDeps
+async def get_user_input(ctx: RunContext[HotelDeps], query: str) -> str:
+    """Ask the guest a clarifying question, alone in its response. The run pauses for the reply."""
+    if not sole_tool_call(ctx):
+        # The other calls finish and their results reach the model, which then asks on its own
+        return ASK_ALONE
+    # Nothing waits for the guest: the run ends here and is resumed from its messages by their reply
+    raise RunSuspended(query, run_usage(ctx), list(ctx.messages))
 
 
-async def get_user_input(ctx: RunContext[HotelDeps], query: str):
-    res = await cl.AskUserMessage(content=query, timeout=30).send()
-    if res:
-        return res
-    else:
-        return "No response from user"
+def resume_history(messages: List[ModelMessage]) -> List[ModelMessage]:
+    """Messages of a suspended run with its question answered, to continue it with the reply"""
+    pending = messages[-1] if messages and isinstance(messages[-1], ModelResponse) else None
+    if pending is None:
+        return messages
+    returns = [
+        ToolReturnPart(tool_name=part.tool_name, content=ANSWERED, tool_call_id=part.tool_call_id)
+        for part in pending.parts
+        if isinstance(part, ToolCallPart)
+    ]
+    return [*messages, ModelRequest(parts=returns)]
@@ -1,11 +1,17 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import os
 from pydantic_ai import RunContext
 import chainlit as cl
-import aiohttp
 from urllib.parse import urlencode
 
 from src.models.hotel_models import HotelDeps
+from src.services.cancellation import hedged
+from src.services.http_client import http_client
+from src.services.search_cache import search_cache, make_key
+
+# Seconds after which a slow SerpAPI request gets a backup request, the first answer wins.
+# 0 turns hedging off; every request sent is a billed search
+SERPAPI_HEDGE_AFTER = float(os.getenv("SERPAPI_HEDGE_AFTER", "0"))
 
 async def web_search(ctx: RunContext[HotelDeps], query: str) -> List[Dict]:
     """Search the web for local information based on the query"""
@@ -35,39 +41,46 @@ async def web_search(ctx: RunContext[HotelDeps], query: str) -> List[Dict]:
             # "tbm": "lcl"  # Local results
         }
 
-        try:
-            # Make direct API request to SerpAPI
-            url = f"https://serpapi.com/search?{urlencode(params)}"
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    response_text = await response.text()
-                    if response.status == 200:
-                        result = await response.json()
-
-                        # print(f'✅ Result: {result}')
+        async def fetch() -> Optional[List[Dict]]:
+            """Call SerpAPI, returning None on errors so they are not cached"""
+            try:
+                # Make direct API request to SerpAPI over the shared connection pool
+                base_url = os.getenv('SERPAPI_URL', 'https://serpapi.com/search')
+                url = f"{base_url}?{urlencode(params)}"
+                response = await hedged(
+                    lambda: http_client.get(url), SERPAPI_HEDGE_AFTER, "serpapi"
+                )
+                if response.status == 200:
+                    result = response.json()
 
-                        # Use organic results if available
-                        organic_results = result.get("organic_results", [])
-                        if not organic_results:
-                            step.output = "No organic results found"
-                            return []
+                    # print(f'✅ Result: {result}')
 
-                        # # Extract local results if available
-                        # local_results = result.get("local_results", [])
-                        # if not local_results:
-                        #     # Fall back to organic results if no local results
-                        #     local_results = result.get("organic_results", [])
+                    # Use organic results if available
+                    return result.get("organic_results", [])
+                else:
+                    error_msg = (
+                        f"Search failed with status {response.status}. Response: {response.text}"
+                    )
+                    print(f'❌ Error Response: {response.text}')
+                    step.output = error_msg
+                    return None
 
-                        step.output = organic_results
-                        return organic_results
-                    else:
-                        error_msg = f"Search failed with status {response.status}. Response: {response_text}"
-                        print(f'❌ Error Response: {response_text}')
-                        step.output = error_msg
-                        return []
+            except Exception as e:
+                error_msg = f"Error performing web search: {str(e)}"
+                print(f'❌ Exception: {str(e)}')
+                step.output = error_msg
+                return None
 
-        except Exception as e:
-            error_msg = f"Error performing web search: {str(e)}"
-            print(f'❌ Exception: {str(e)}')
-            step.output = error_msg
+        # Identical searches for the same hotel share one cached SerpAPI call
+        key = make_key(query, location.full_address, params["gl"], params["hl"])
+        organic_results, cached = await search_cache.get_or_fetch(key, fetch)
+        if organic_results is None:
             return []
+        if not organic_results:
+            step.output = "No organic results found"
+            return []
+
+        step.output = organic_results
+        if cached:
+            step.name = "Web Search Tool (cached)"
+        return organic_results
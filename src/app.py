@@ -1,16 +1,60 @@
+import asyncio
+import os
+from urllib.parse import parse_qs, urlparse
+
 import chainlit as cl
+from chainlit.config import config as cl_config
+from chainlit.session import WebsocketSession
 from pydantic_ai.usage import Usage, UsageLimits, UsageLimitExceeded
 from typing import Any, cast, Union
 from engineio.payload import Payload
 from pydantic import ValidationError
-from pydantic_ai.messages import ModelMessage
+from chainlit.server import app as server_app
 
 # Configure engineio to handle larger payloads
 Payload.max_decode_packets = 1000
 
-from src.agents.supervisor_agent import supervisor_agent, reset_processed_requests
-from src.agents.room_service_agent import room_service_agent
-from src.models.hotel_models import HotelDeps, HotelRequest, TaskResponse, Failed, SAMPLE_HOTEL_DATA
+from src.agents.supervisor_agent import DUPLICATE_REQUEST, get_supervisor_agent
+from src.agents.router import Route, router_for, SPECIALISTS
+from src.agents.tools.user_input import resume_history
+from src.models.hotel_models import (
+    HotelDeps, HotelRequest, TaskResponse, Failed, RunEnded, RunSuspended
+)
+from src.services.hotel_registry import hotel_registry
+from src.services.model_tiers import model_tiers
+from src.services.memory import ConversationMemory
+from src.services.session_state import SessionState
+from src.services.cancellation import TURN_DEADLINE, turn_scopes
+from src.services.event_log import event_log
+from src.services.idempotency import idempotency_store
+from src.services.search_cache import search_cache
+from src.services.reply_stream import ReplyStream, STREAM_DEBOUNCE, STREAM_REPLIES
+from src.services.partial_json import ResultStreamDecoder
+from src.services.prompts import with_context
+from src.services import admission, lifecycle, metrics
+# Imported for the lifecycle hooks of the shared HTTP client it registers
+from src.services import http_client  # noqa: F401
+
+# Start and stop shared resources (HTTP pool, ...) with the Chainlit server
+lifecycle.install(server_app)
+# Prometheus metrics of agents, tools and caches
+metrics.install(server_app)
+
+# Build the agents and load the model client in the background once the server is up,
+# instead of on the first guest message (set to false to build them on first use)
+PRELOAD_AGENTS = os.getenv("PRELOAD_AGENTS", "true").lower() in ("1", "true", "yes")
+
+
+def preload_agents() -> None:
+    for get_agent in [get_supervisor_agent, *SPECIALISTS.values()]:
+        _ = get_agent().model.model_name  # resolving the model imports the provider's SDK
+
+
+@lifecycle.on_startup
+async def start_preloading_agents() -> None:
+    if PRELOAD_AGENTS:
+        # Not awaited, the server does not wait for it to become ready
+        asyncio.get_running_loop().run_in_executor(None, preload_agents)
 
 # Initialize usage limits - reduce limits to prevent too many API calls
 usage_limits = UsageLimits(
@@ -18,15 +62,28 @@ usage_limits = UsageLimits(
     total_tokens_limit=12000,  # Keep reasonable token limit
 )
 
-# Store conversation history
-message_history: list[ModelMessage] = []
+def session_hotel_id() -> str:
+    """Property of the chat session, from ?hotel=<id> in the page the chat was opened from"""
+    hotel_id = cl.user_session.get("hotel_id")
+    if hotel_id is None:
+        query = urlparse(cl.context.session.http_referer or "").query
+        hotel_id = parse_qs(query).get("hotel", [""])[0]
+        if hotel_id and not hotel_registry.exists(hotel_id):
+            print(f'⚠️ Unknown hotel {hotel_id}, serving the session as {hotel_registry.default}')
+            hotel_id = ""
+        hotel_id = hotel_id or hotel_registry.default
+        cl.user_session.set("hotel_id", hotel_id)
+    return hotel_id
 
 @cl.on_chat_start
 async def start():
     """Initialize the chat session."""
-    # Reset the processed requests and message history at the start of each conversation
-    reset_processed_requests()
-    message_history.clear()
+    session_hotel_id()
+    # Conversation memory and usage counters live in the shared session store, so any
+    # worker can serve the session; the memory is also kept in the worker for speed
+    state = SessionState(cl.context.session.id)
+    cl.user_session.set("state", state)
+    cl.user_session.set("memory", await state.load_memory())
 
     await cl.Message(
         content="""
@@ -51,56 +108,225 @@ How may I assist you today?
         author="Concierge"
     ).send()
 
+@cl.on_chat_end
+async def end():
+    """Release the session's dedup state and stop work for a guest who left."""
+    # Chainlit does not cancel the running message on disconnect
+    turn_scopes.cancel(cl.context.session.id, "disconnect")
+    deps = cl.user_session.get("deps")
+    if deps:
+        await idempotency_store.reset(idempotency_store.scope(deps.session_id, deps.room_number))
+    state: SessionState = cl.user_session.get("state")
+    if state:
+        task = asyncio.create_task(release_session_state(cl.context.session, state))
+        releases.add(task)
+        task.add_done_callback(releases.discard)
+
+# Sessions waiting to be released once their guest can no longer reconnect
+releases: set[asyncio.Task] = set()
+
+async def release_session_state(session: WebsocketSession, state: SessionState) -> None:
+    """Drop the session's memory, usage and suspended run once it can no longer be reconnected.
+
+    Chainlit ends the chat on every disconnect but restores the session when the guest comes
+    back within session_timeout, with a new socket.
+    """
+    socket_id = session.socket_id
+    await asyncio.sleep(cl_config.project.session_timeout)
+    if session.socket_id == socket_id:
+        await state.clear()
+
+def cached_share(usage: Usage) -> float:
+    """Share of the prompt tokens the provider read from its prompt cache"""
+    cached = (usage.details or {}).get("cached_tokens", 0)
+    return cached / usage.request_tokens if usage.request_tokens else 0.0
+
 def format_usage(usage: Usage) -> str:
     """Format usage statistics."""
     return f"""
 ## 📊 Session Statistics
 - **Total Tokens**: {usage.total_tokens}
-- **Prompt Tokens**: {usage.request_tokens}
+- **Prompt Tokens**: {usage.request_tokens} ({cached_share(usage):.0%} served from the prompt cache)
 - **Completion Tokens**: {usage.response_tokens}
 - **API Calls**: {usage.requests}
+- **Search Cache**: {search_cache.hit_rate:.0%} hit rate ({search_cache.stats["misses"]} misses)
     """
 
+def format_status(response: TaskResponse) -> tuple[str, str]:
+    """Step output and guest-facing text of a TaskResponse"""
+    status = response.get('status', 'Processing')
+    details = response.get('message', 'Working on your request...')
+    eta = response.get('eta', 'Calculating...')
+
+    formatted_response = f"""
+## ✅ Request Status
+**Status**: {status}
+**Details**: {details}
+**Timeline**: {eta}
+"""
+    # Create a more natural response for the user
+    user_message = details
+    if eta and eta != "immediate":
+        user_message += f"\n\nExpected time: {eta}"
+    return formatted_response, user_message
+
+@cl.on_stop
+async def stop():
+    """Count the stop button, Chainlit cancels the running message itself."""
+    turn_scopes.cancel(cl.context.session.id, "stop")
+
 @cl.on_message
 async def main(message: cl.Message):
+    """Handle a guest message as the session's turn, cancelling the one still running."""
+    try:
+        async with turn_scopes.turn(cl.context.session.id):
+            await handle_message(message)
+    except TimeoutError:
+        session_id = cl.context.session.id
+        print(f'⏱️ Turn of session {session_id} cancelled after {TURN_DEADLINE:g} seconds')
+        await cl.Message(
+            content=(
+                "I'm sorry, this is taking longer than it should. "
+                "Please try again or contact the front desk."
+            ),
+            author="Concierge",
+        ).send()
+
+async def handle_message(message: cl.Message):
     """Handle incoming guest requests."""
+    reply = ReplyStream()  # Guest-facing message, filled in as the reply is generated
+    claimed = None  # Fingerprint of a routed request, released unless the request completes
     try:
         # Create a root step for the entire request
         async with cl.Step(name="Request Processing", type="run") as root_step:
             root_step.input = message.content
+            state: SessionState = (
+                cl.user_session.get("state") or SessionState(cl.context.session.id)
+            )
+            memory: ConversationMemory = cl.user_session.get("memory")
+            if memory is None:
+                # The session started on another worker
+                memory = await state.load_memory()
+                cl.user_session.set("state", state)
+                cl.user_session.set("memory", memory)
+
+            # Loaded properties are looked up, not rebuilt, whatever their number
+            hotel = hotel_registry.get(session_hotel_id())
 
             # Mock guest info - in a real system this would come from authentication
             deps = HotelDeps(
                 room_number="101",
                 guest_name="John Doe",
-                hotel_location=SAMPLE_HOTEL_DATA["location"]
+                hotel_location=hotel.location,
+                session_id=cl.context.session.id,
+                hotel_id=hotel.id,
             )
+            cl.user_session.set("deps", deps)
 
             formatted_response = ""  # Initialize response variable
             user_message = ""  # Initialize user message
-            try:
-                # Run the supervisor agent with streaming and message history
-                async with supervisor_agent.run_stream(
-                    message.content,
-                    deps=deps,
-                    usage_limits=usage_limits,
-                    message_history=message_history,  # Pass the conversation history
-                ) as result:
-                    try:
-                        # Stream the structured response
-                        async for message_data, is_last in result.stream_structured(debounce_by=1.0):
-                            try:
-                                # Validate the response
-                                response = await result.validate_structured_result(
-                                    message_data,
-                                    allow_partial=not is_last,
-                                )
 
-                                if isinstance(response, dict):
-                                    # Format the response based on type
-                                    if "reason" in response:
-                                        if "Usage limit reached" in response["reason"]:
-                                            formatted_response = f"""
+            repeated = False  # a routed request the guest already made
+            suspended = await state.pop_suspended_run()
+            if suspended is not None:
+                # The supervisor asked the guest a question, this message answers it and resumes it
+                route = Route(service=None, confidence=1.0, matches=[])
+                agent = get_supervisor_agent()
+                prompt = message.content
+                history = resume_history(suspended)
+                root_step.name = "Request Processing (Reply)"
+            else:
+                # Obvious single-intent requests skip the supervisor and go straight to a specialist
+                route = router_for(hotel).classify(message.content)
+                if route.service:
+                    agent = SPECIALISTS[route.service]()
+                    # The history belongs to the supervisor's conversation, the earlier turns go
+                    # in the prompt so follow-ups such as "make that two" keep their referent
+                    prompt = memory.prompt_with_context(message.content, history=False)
+                    history = []
+                    service = route.service.replace('_', ' ').title()
+                    root_step.name = f"Request Processing ({service})"
+                    # Delegations through the supervisor are checked for repeats, so are these
+                    scope = idempotency_store.scope(deps.session_id, deps.room_number)
+                    repeated = not await idempotency_store.first_time(
+                        scope, route.service, message.content
+                    )
+                    if not repeated:
+                        claimed = (scope, route.service, message.content)
+                else:
+                    agent = get_supervisor_agent()
+                    prompt = memory.prompt_with_context(message.content)
+                    history = memory.history()  # Pass the compacted conversation history
+
+            # Date, guest and room go last, so the system prompt and history stay cacheable
+            prompt = with_context(prompt, deps)
+
+            # Model requests of this message queue by urgency and take turns with other guests
+            admission.current_priority.set(
+                admission.priority_for(message.content, route.service, hotel.id)
+            )
+            admission.current_session.set(cl.context.session.id)
+            busy = admission.admission_controller.depth() >= admission.ADMISSION_BUSY_QUEUE
+            if busy and not repeated:
+                # Tell the guest their request is waiting, the reply replaces this once it streams
+                await reply.update(
+                    "We're attending to many guests right now, I'll be with you in just a moment..."
+                )
+
+            if repeated:
+                user_message = DUPLICATE_REQUEST
+                root_step.output = f"""
+## 🔁 Duplicate Request
+**Reason**: {user_message}
+"""
+                memory.add_turn(message.content, user_message)
+
+            # The run starts on the agent's model tier and is repeated on a stronger model
+            # while the result fails validation or comes back Failed
+            tier = None if repeated else model_tiers.initial_tier(agent.name, message.content)
+            while tier:
+                escalate_to = None
+                try:
+                    # Run the selected agent with streaming and message history
+                    async with metrics.Track(
+                        "agent", agent.name, metrics.AGENT_RUN_SECONDS
+                    ), model_tiers.track(agent.name, tier), agent.run_stream(
+                        prompt,
+                        deps=deps,
+                        usage_limits=usage_limits,
+                        message_history=history,
+                        model=model_tiers.model(agent.name, tier),
+                    ) as result:
+                        try:
+                            # Stream the structured response
+                            debounce = STREAM_DEBOUNCE if STREAM_REPLIES else 1.0
+                            decoder = ResultStreamDecoder()
+                            stream = result.stream_structured(debounce_by=debounce)
+                            async for message_data, is_last in stream:
+                                try:
+                                    if is_last:
+                                        # Validate the complete response once
+                                        response = await result.validate_structured_result(
+                                            message_data
+                                        )
+                                        reason = model_tiers.escalation_reason(response)
+                                        escalate_to = reason and model_tiers.escalate(
+                                            agent.name, tier, reason
+                                        )
+                                        if escalate_to:
+                                            await state.add_usage(result.usage())
+                                            break
+                                    else:
+                                        # Decode only what arrived since the last tick
+                                        if not decoder.feed(message_data):
+                                            continue
+                                        response = decoder.partial
+
+                                    if isinstance(response, dict):
+                                        # Format the response based on type
+                                        if "reason" in response:
+                                            if "Usage limit reached" in response["reason"]:
+                                                formatted_response = f"""
 ## ⏸️ Request Paused
 Some parts of your request were processed, but we need to pause to stay within limits.
 Please try any remaining requests as separate messages.
@@ -111,50 +337,68 @@ Please try any remaining requests as separate messages.
 For multiple requests like towels and restaurant recommendations,
 try sending them as separate messages for better handling.
 """
-                                            user_message = (
-                                                "I need to pause briefly to stay within limits. "
-                                                "I've processed part of your request, but please send any "
-                                                "remaining requests as separate messages."
-                                            )
-                                        else:
-                                            formatted_response = f"""
+                                                user_message = (
+                                                    "I need to pause briefly to stay within "
+                                                    "limits. I've processed part of your "
+                                                    "request, but please send any remaining "
+                                                    "requests as separate messages."
+                                                )
+                                            else:
+                                                formatted_response = f"""
 ## ❌ Request Failed
 **Reason**: {response["reason"]}
 """
-                                            user_message = f"I apologize, but I couldn't process your request: {response['reason']}"
-                                    else:
-                                        status = response.get('status', 'Processing')
-                                        message = response.get('message', 'Working on your request...')
-                                        eta = response.get('eta', 'Calculating...')
-
-                                        formatted_response = f"""
-## ✅ Request Status
-**Status**: {status}
-**Details**: {message}
-**Timeline**: {eta}
-"""
-                                        # Create a more natural response for the user
-                                        user_message = message
-                                        if eta and eta != "immediate":
-                                            user_message += f"\n\nExpected time: {eta}"
-
+                                                user_message = (
+                                                    "I apologize, but I couldn't process your "
+                                                    f"request: {response['reason']}"
+                                                )
+                                            # A stronger model gets another go before the guest
+                                            # hears of a failure
+                                            if response["reason"] and tier == model_tiers.strongest:
+                                                await reply.update(user_message)
+                                        else:
+                                            formatted_response, user_message = format_status(
+                                                response
+                                            )
+                                            # Stream the message as it arrives, the ETA is only
+                                            # final at the end
+                                            await reply.update(response.get('message', ''))
+
+                                        if is_last:
+                                            # Add the session's usage statistics to step output only
+                                            usage_stats = await state.add_usage(result.usage())
+                                            formatted_response += "\n" + format_usage(usage_stats)
+                                            # Update memory with the completed interaction
+                                            if route.service is None:
+                                                memory.capture_system_prompts(result.all_messages())
+                                            memory.add_turn(message.content, user_message)
+                                            if "reason" not in response:
+                                                claimed = None
+
+                                        # Update step output but don't send message yet
+                                        root_step.output = formatted_response
+
+                                except ValidationError as invalid:
                                     if is_last:
-                                        # Add usage statistics to step output only
-                                        usage_stats = result.usage()
-                                        formatted_response += "\n" + format_usage(usage_stats)
-                                        # Update message history with the completed interaction
-                                        message_history.extend(result.all_messages())
-
-                                    # Update step output but don't send message yet
-                                    root_step.output = formatted_response
-
-                            except ValidationError:
-                                # Skip invalid partial responses
+                                        reason = model_tiers.escalation_reason(error=invalid)
+                                        escalate_to = model_tiers.escalate(
+                                            agent.name, tier, reason
+                                        )
+                                        if escalate_to:
+                                            await state.add_usage(result.usage())
+                                            break
+                                    # Skip an invalid response
+                                    continue
+
+                        except Exception as stream_error:
+                            metrics.record_error("agent", agent.name, stream_error)
+                            reason = model_tiers.escalation_reason(error=stream_error)
+                            escalate_to = reason and model_tiers.escalate(agent.name, tier, reason)
+                            if escalate_to:
+                                tier = escalate_to
                                 continue
-
-                    except Exception as stream_error:
-                        if isinstance(stream_error, UsageLimitExceeded):
-                            formatted_response = f"""
+                            if isinstance(stream_error, UsageLimitExceeded):
+                                formatted_response = f"""
 ## ⏸️ Request Paused
 We need to pause processing to stay within usage limits.
 Please try breaking down your request into smaller parts.
@@ -165,40 +409,76 @@ Please try breaking down your request into smaller parts.
 For multiple requests, try sending them as separate messages
 for better handling (e.g. first ask for towels, then for recommendations).
 """
-                            user_message = (
-                                "I need to pause to stay within limits. "
-                                "Please break down your request into smaller parts - "
-                                "first ask about the towels, then about restaurant recommendations."
-                            )
-                        else:
-                            formatted_response = f"⚠️ Stream processing error: {str(stream_error)}"
-                            user_message = "I encountered an error while processing your request. Please try again."
-
-                        root_step.output = formatted_response
-
-            except Exception as agent_error:
-                if isinstance(agent_error, UsageLimitExceeded):
-                    formatted_response = f"""
+                                user_message = (
+                                    "I need to pause to stay within limits. "
+                                    "Please break down your request into smaller parts - "
+                                    "first ask about the towels, "
+                                    "then about restaurant recommendations."
+                                )
+                            else:
+                                formatted_response = (
+                                    f"⚠️ Stream processing error: {str(stream_error)}"
+                                )
+                                user_message = (
+                                    "I encountered an error while processing your request. "
+                                    "Please try again."
+                                )
+
+                            root_step.output = formatted_response
+
+                except RunEnded as ended:
+                    # A single specialist answered, its result goes to the guest without another
+                    # supervisor turn, or the supervisor asked the guest a question and its run
+                    # waits for the reply
+                    if isinstance(ended, RunSuspended):
+                        await state.suspend_run(ended.messages)
+                    formatted_response, user_message = format_status(ended.result)
+                    usage_stats = await state.add_usage(ended.usage)
+                    formatted_response += "\n" + format_usage(usage_stats)
+                    memory.capture_system_prompts(ended.messages)
+                    memory.add_turn(message.content, user_message)
+                    root_step.output = formatted_response
+
+                except Exception as agent_error:
+                    reason = model_tiers.escalation_reason(error=agent_error)
+                    escalate_to = reason and model_tiers.escalate(agent.name, tier, reason)
+                    if escalate_to:
+                        tier = escalate_to
+                        continue
+                    if isinstance(agent_error, UsageLimitExceeded):
+                        formatted_response = f"""
 ## ⏸️ Request Paused
 We need to pause processing to stay within usage limits.
 Please try your request again as smaller parts.
 
 **Reason**: {str(agent_error)}
 """
-                    user_message = (
-                        "I need to pause to stay within limits. "
-                        "Please send your requests separately - "
-                        "first ask about one thing, then about the other."
-                    )
-                else:
-                    formatted_response = f"🚨 Agent error: {str(agent_error)}"
-                    user_message = "I encountered an error processing your request. Please try again."
-
-                root_step.output = formatted_response
-
-            # Send the final response as a regular message only once at the end
+                        user_message = (
+                            "I need to pause to stay within limits. "
+                            "Please send your requests separately - "
+                            "first ask about one thing, then about the other."
+                        )
+                    else:
+                        formatted_response = f"🚨 Agent error: {str(agent_error)}"
+                        user_message = (
+                            "I encountered an error processing your request. Please try again."
+                        )
+
+                    root_step.output = formatted_response
+
+                tier = escalate_to
+
+            # Complete the streamed reply with the final text
             if user_message:
-                await cl.Message(content=user_message).send()
+                await reply.finish(user_message)
+                # Queued for the write-behind log, the guest never waits for the disk
+                await event_log.record(
+                    deps.session_id, "turn", {"user": message.content, "assistant": user_message}
+                )
+
+            # Persist the turn, then summarize older turns off the guest-facing path
+            await state.save_memory(memory)
+            memory.schedule_compaction(lambda: state.save_memory(memory))
 
     except Exception as e:
         formatted_response = ""
@@ -232,4 +512,14 @@ Please try again or contact the front desk for assistance.
 
         if root_step:
             root_step.output = formatted_response
-        await cl.Message(content=user_message).send()
+        await reply.finish(user_message)
+
+    except asyncio.CancelledError:
+        # Stopped, replaced by a newer message or over the deadline, nothing more will stream
+        await reply.cancel()
+        raise
+
+    finally:
+        if claimed:
+            # Failed or cancelled, the guest may ask again
+            await idempotency_store.release(*claimed)
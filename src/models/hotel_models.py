@@ -2,6 +2,9 @@ from typing import Literal, Union, Dict, List
 from typing_extensions import TypedDict
 from dataclasses import dataclass
 
+from pydantic_ai.messages import ModelMessage
+from pydantic_ai.usage import Usage
+
 class HotelRequest(TypedDict, total=False):
     """Guest request details"""
     request_type: str  # Type of request (room service, concierge, maintenance)
@@ -31,6 +34,7 @@ class Location:
     country: str
     postal_code: str
     coordinates: tuple[float, float]  # latitude, longitude
+    timezone: str = "UTC"  # IANA timezone of the hotel clock
 
 @dataclass
 class HotelDeps:
@@ -38,17 +42,26 @@ class HotelDeps:
     room_number: str
     guest_name: str
     hotel_location: Location
+    session_id: str = ""  # Chainlit session the request belongs to
+    hotel_id: str = ""  # Property in the hotel registry, the default one when empty
+
+
+class RunEnded(Exception):  # noqa: N818 - ends the run, it is not an error
+    """Raised by a tool to end the agent run with result, skipping the model's final turn"""
+
+    def __init__(
+        self, result: Union[TaskResponse, Failed], usage: Usage, messages: List[ModelMessage]
+    ):
+        super().__init__("Run ended by a tool")
+        self.result = result
+        self.usage = usage  # of the run so far
+        self.messages = messages  # of the run so far
+
+
+class RunSuspended(RunEnded):
+    """Raised by a tool to suspend the agent run until the guest answers question"""
 
-# Example hotel data (in production this would come from a real database)
-SAMPLE_HOTEL_DATA = {
-    "location": Location(
-        name="The Funkhaus Hotel",
-        full_address="Kortumstr 68, 44787 Bochum, Germany",
-        address="Kortumstr 68",
-        city="Bochum",
-        state="NRW",
-        country="de",
-        postal_code="44787",
-        coordinates=(51.4803947247399, 7.217586297768458)
-    )
-}
\ No newline at end of file
+    def __init__(self, question: str, usage: Usage, messages: List[ModelMessage]):
+        pending = TaskResponse(status="pending", message=question, eta="immediate")
+        super().__init__(pending, usage, messages)
+        self.question = question
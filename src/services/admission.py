@@ -0,0 +1,332 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional
+
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.settings import ModelSettings
+from pydantic_ai.usage import Usage
+
+from src.services.hotel_registry import hotel_registry
+from src.services.metrics import ADMISSION_WAIT_SECONDS, CallbackGauge, Counter
+from src.services.wrapped_model import WrappedModel
+
+# Provider rate limits shared by every agent run of this worker, 0 disables a limit.
+# With several workers, give each its share of the account's limits.
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+# Tokens reserved for the reply of a request until its actual usage is known
+LLM_RESPONSE_TOKENS_ESTIMATE = int(os.getenv("LLM_RESPONSE_TOKENS_ESTIMATE", "500"))
+# Times a request rejected by the provider with 429 is queued again before giving up
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "2"))
+# Queued model requests at which guests are told their request is waiting
+ADMISSION_BUSY_QUEUE = int(os.getenv("ADMISSION_BUSY_QUEUE", "10"))
+
+# Priority classes, lower is served first
+URGENT, SERVICE, BROWSING, BACKGROUND = range(4)
+PRIORITY_NAMES = {
+    URGENT: "urgent", SERVICE: "service", BROWSING: "browsing", BACKGROUND: "background",
+}
+# Maintenance catalog priorities that jump the queue (leaks, climate control, repairs)
+URGENT_SERVICE_PRIORITIES = ("emergency", "high")
+
+# Priority and session of the model requests made by the current task and the tasks it spawns
+current_priority: ContextVar[int] = ContextVar("admission_priority", default=SERVICE)
+current_session: ContextVar[str] = ContextVar("admission_session", default="")
+
+
+def priority_for(text: str, service: Optional[str] = None, hotel_id: str = "") -> int:
+    """Priority class of a guest message, or of a request delegated to service"""
+    if service in (None, "maintenance"):
+        matches = hotel_registry.get(hotel_id).services.match(text)
+        if matches and matches[0].get("priority") in URGENT_SERVICE_PRIORITIES:
+            return URGENT
+    if service == "concierge":
+        return BROWSING
+    return SERVICE
+
+
+@contextmanager
+def prioritized(priority: int, session: Optional[str] = None) -> Iterator[None]:
+    """Run the model requests made inside the block with the given priority (and session)"""
+    priority_token = current_priority.set(priority)
+    session_token = current_session.set(session) if session is not None else None
+    try:
+        yield
+    finally:
+        current_priority.reset(priority_token)
+        if session_token is not None:
+            current_session.reset(session_token)
+
+
+class TokenBucket:
+    """Refills continuously at per_minute, holding at most a minute's worth"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be taken"""
+        if not self.enabled:
+            return 0.0
+        self._refill()
+        # A request larger than the bucket would never fit, it only has to wait for a full one
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float) -> None:
+        """Take amount, or give it back when negative. The level may go below zero."""
+        if not self.enabled:
+            return
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the provider reported its limit was reached"""
+        if self.enabled:
+            self._refill()
+            self.level = min(self.level, 0.0)
+
+
+@dataclass
+class Waiter:
+    priority: int
+    session: str
+    tokens: int
+    future: asyncio.Future = field(repr=False)
+
+
+class AdmissionController:
+    """Admits model requests within the requests and tokens per minute budgets.
+
+    Requests that do not fit wait in line instead of failing: the most urgent
+    priority class goes first, and within a class the sessions take turns, so
+    one guest's many requests cannot starve the others.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        # Per priority class, the waiting requests of each session in round-robin order
+        self._queues: Dict[int, "OrderedDict[str, Deque[Waiter]]"] = {
+            priority: OrderedDict() for priority in PRIORITY_NAMES
+        }
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def depth(self, priority: Optional[int] = None) -> int:
+        """Requests waiting for admission, of one priority class or all of them"""
+        priorities = PRIORITY_NAMES if priority is None else (priority,)
+        return sum(
+            1
+            for p in priorities
+            for waiters in self._queues[p].values()
+            for waiter in waiters
+            if not waiter.future.done()
+        )
+
+    async def acquire(
+        self, tokens: int, priority: Optional[int] = None, session: Optional[str] = None
+    ) -> float:
+        """Wait until a request of about tokens may be sent, return the seconds waited"""
+        priority = current_priority.get() if priority is None else priority
+        session = current_session.get() if session is None else session
+        started = time.monotonic()
+
+        if not self.depth() and not self._wait_time(tokens):
+            self._take(tokens)
+        else:
+            waiter = Waiter(priority, session, tokens, asyncio.get_running_loop().create_future())
+            self._queues[priority].setdefault(session, deque()).append(waiter)
+            if self._dispatcher is None or self._dispatcher.done():
+                self._dispatcher = asyncio.create_task(self._dispatch())
+            # A cancelled caller cancels its future, the dispatcher then skips it
+            await waiter.future
+
+        waited = time.monotonic() - started
+        ADMISSION_WAIT_SECONDS.observe(waited, priority=PRIORITY_NAMES[priority])
+        return waited
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Correct the tokens budget once the actual usage of a request is known"""
+        self.tokens.take(actual - estimated)
+
+    def throttle(self) -> None:
+        """Stop admitting until the budgets refill, after the provider answered 429"""
+        self.requests.drain()
+        self.tokens.drain()
+
+    def _wait_time(self, tokens: int) -> float:
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    def _take(self, tokens: int) -> None:
+        self.requests.take(1)
+        self.tokens.take(tokens)
+
+    def _next(self) -> Optional[Waiter]:
+        """First waiter of the most urgent class, dropping cancelled ones on the way"""
+        for queue in self._queues.values():
+            while queue:
+                session, waiters = next(iter(queue.items()))
+                while waiters and waiters[0].future.done():
+                    waiters.popleft()
+                if waiters:
+                    return waiters[0]
+                del queue[session]
+        return None
+
+    async def _dispatch(self) -> None:
+        while True:
+            waiter = self._next()
+            if waiter is None:
+                return
+            delay = self._wait_time(waiter.tokens)
+            if delay > 0:
+                # A more urgent request arriving meanwhile is picked up after the sleep
+                await asyncio.sleep(delay)
+                continue
+
+            queue = self._queues[waiter.priority]
+            waiters = queue.pop(waiter.session)
+            waiters.popleft()
+            if waiters:
+                # The session goes to the back of its class
+                queue[waiter.session] = waiters
+            self._take(waiter.tokens)
+            waiter.future.set_result(None)
+
+
+admission_controller = AdmissionController()
+
+ADMISSION_QUEUE_DEPTH = CallbackGauge(
+    "hotel_admission_queue_depth",
+    "Model requests waiting for admission by priority class",
+    ["priority"],
+    lambda: {
+        (name,): admission_controller.depth(priority) for priority, name in PRIORITY_NAMES.items()
+    },
+)
+ADMISSION_BUDGET = CallbackGauge(
+    "hotel_admission_budget",
+    "Requests and tokens that can be sent right now",
+    ["budget"],
+    lambda: {
+        (name,): bucket.level
+        for name, bucket in (
+            ("requests", admission_controller.requests), ("tokens", admission_controller.tokens)
+        )
+        if bucket.enabled
+    },
+)
+RATE_LIMITED = Counter(
+    "hotel_rate_limited_total", "Model requests the provider rejected with 429", ["agent"]
+)
+
+
+def estimate_tokens(messages: list[ModelMessage], model_settings: ModelSettings | None) -> int:
+    """Rough tokens of a request: about four characters per token plus the expected reply"""
+    chars = 0
+    for message in messages:
+        for part in message.parts:
+            content = getattr(part, "content", None)
+            if content is None:
+                content = getattr(part, "args", "")
+            chars += len(content) if isinstance(content, str) else len(str(content))
+    reply = (model_settings or {}).get("max_tokens") or LLM_RESPONSE_TOKENS_ESTIMATE
+    return chars // 4 + reply
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+class AdmittedModel(WrappedModel):
+    """Model wrapper that passes every request through the admission controller"""
+
+    def __init__(
+        self,
+        model: Model | str,
+        agent: Optional[str] = None,
+        controller: AdmissionController = admission_controller,
+    ):
+        super().__init__(model)
+        # An InstrumentedModel already knows its agent
+        self.agent = agent or getattr(model, "agent", None) or str(model)
+        self.controller = controller
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> tuple[ModelResponse, Usage]:
+        estimated = estimate_tokens(messages, model_settings)
+        attempt = 0
+        while True:
+            await self.controller.acquire(estimated)
+            try:
+                response, usage = await self.wrapped.request(
+                    messages, model_settings, model_request_parameters
+                )
+            except Exception as e:
+                self._rejected(e, attempt)
+                attempt += 1
+                continue
+            self.controller.settle(estimated, usage.total_tokens or estimated)
+            return response, usage
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        estimated = estimate_tokens(messages, model_settings)
+        attempt = 0
+        async with AsyncExitStack() as stack:
+            while True:
+                await self.controller.acquire(estimated)
+                try:
+                    # A 429 arrives before the first chunk, so only opening the stream is retried
+                    stream = await stack.enter_async_context(
+                        self.wrapped.request_stream(
+                            messages, model_settings, model_request_parameters
+                        )
+                    )
+                    break
+                except Exception as e:
+                    self._rejected(e, attempt)
+                    attempt += 1
+            try:
+                yield stream
+            finally:
+                self.controller.settle(estimated, stream.usage().total_tokens or estimated)
+
+    def _rejected(self, error: Exception, attempt: int) -> None:
+        """Queue the request again after a 429, re-raise anything else"""
+        if not is_rate_limited(error) or attempt >= LLM_RATE_LIMIT_RETRIES:
+            raise error
+        RATE_LIMITED.inc(agent=self.agent)
+        print(f'⏳ Rate limited by the model provider, queueing {self.agent} request again')
+        self.controller.throttle()
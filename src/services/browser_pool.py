@@ -0,0 +1,197 @@
+import asyncio
+import importlib
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, List
+
+from src.services.lifecycle import on_shutdown, on_startup
+
+if TYPE_CHECKING:
+    from crawl4ai import AsyncWebCrawler
+
+# Number of warm browser instances
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+# Page loads allowed at once across all instances, callers beyond that queue in order
+BROWSER_MAX_CONCURRENT_PAGES = int(os.getenv("BROWSER_MAX_CONCURRENT_PAGES", "4"))
+# An instance is restarted after this many pages to keep its memory in check
+BROWSER_PAGES_PER_INSTANCE = int(os.getenv("BROWSER_PAGES_PER_INSTANCE", "50"))
+# Launch the browsers in the background at startup instead of on the first page load
+BROWSER_POOL_WARM = os.getenv("BROWSER_POOL_WARM", "true").lower() in ("1", "true", "yes")
+
+
+def default_crawler() -> "AsyncWebCrawler":
+    # crawl4ai pulls in Playwright, it is only imported once a page is actually fetched
+    from crawl4ai import AsyncWebCrawler
+
+    return AsyncWebCrawler()
+
+
+@dataclass
+class BrowserInstance:
+    """A running crawler and its usage counters"""
+    crawler: "AsyncWebCrawler"
+    pages: int = 0
+    active: int = 0
+    retiring: bool = False
+
+
+class BrowserPool:
+    """Pool of warm crawl4ai browsers owned by the app lifecycle.
+
+    Instances are recycled after a fixed number of pages or when a page load
+    crashes, and a replacement is warmed in the background. Browsers launch
+    outside the pool's bookkeeping, so a slow launch never holds up page loads
+    on the instances already running.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        max_concurrent_pages: int = BROWSER_MAX_CONCURRENT_PAGES,
+        pages_per_instance: int = BROWSER_PAGES_PER_INSTANCE,
+        crawler_factory: Callable[[], Any] = default_crawler,
+    ):
+        self.size = size
+        self.crawler_factory = crawler_factory  # swapped for a stand-in by the benchmarks
+        self.pages_per_instance = pages_per_instance
+        self._instances: List[BrowserInstance] = []
+        self._pages = asyncio.Semaphore(max_concurrent_pages)
+        self._launches: set[asyncio.Task] = set()  # browsers starting, counted towards size
+        self._background: set[asyncio.Task] = set()
+        self._closed = False
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "instances": len(self._instances),
+            "active_pages": sum(instance.active for instance in self._instances),
+            "pages_served": sum(instance.pages for instance in self._instances),
+        }
+
+    async def start(self) -> None:
+        """Launch instances until the pool is at its target size"""
+        missing = self.size - len(self._healthy()) - len(self._launches)
+        await asyncio.gather(*(self._grow() for _ in range(missing)))
+
+    async def close(self) -> None:
+        self._closed = True
+        for task in list(self._background):
+            task.cancel()
+        # Browsers still starting shut themselves down once they are up
+        await asyncio.gather(*self._launches, return_exceptions=True)
+        instances, self._instances = self._instances, []
+        for instance in instances:
+            await self._shutdown(instance)
+
+    async def fetch(self, url: str) -> Any:
+        """Load url on a pooled browser and return the crawl result"""
+        async with self.lease() as crawler:
+            return await crawler.arun(url=url)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator["AsyncWebCrawler"]:
+        """Borrow a crawler for one page load"""
+        async with self._pages:
+            instance = await self._acquire()
+            instance.active += 1
+            instance.pages += 1
+            crashed = True
+            try:
+                yield instance.crawler
+                crashed = False
+            except asyncio.CancelledError:
+                # The page load was abandoned, the browser itself is fine
+                crashed = False
+                raise
+            finally:
+                instance.active -= 1
+                if crashed or instance.pages >= self.pages_per_instance:
+                    instance.retiring = True
+                if instance.retiring and instance.active == 0:
+                    self._spawn(self._recycle(instance))
+
+    def _healthy(self) -> List[BrowserInstance]:
+        return [instance for instance in self._instances if not instance.retiring]
+
+    async def _acquire(self) -> BrowserInstance:
+        # Nothing awaits between looking at the pool and deciding, so callers cannot race
+        while True:
+            healthy = self._healthy()
+            idle = [instance for instance in healthy if instance.active == 0]
+            if idle:
+                return idle[0]
+            if len(healthy) + len(self._launches) < self.size:
+                return await self._grow()
+            if healthy:
+                # Every instance is busy, share the least loaded one
+                return min(healthy, key=lambda instance: instance.active)
+            # No browser is up yet, wait for one of those starting
+            await asyncio.wait(set(self._launches), return_when=asyncio.FIRST_COMPLETED)
+
+    def _grow(self) -> "asyncio.Future[BrowserInstance]":
+        """Launch another instance, it joins the pool even if the caller stops waiting"""
+        task = asyncio.create_task(self._launch())
+        self._launches.add(task)
+        task.add_done_callback(self._launches.discard)
+        return asyncio.shield(task)
+
+    async def _launch(self) -> BrowserInstance:
+        crawler = self.crawler_factory()
+        await crawler.__aenter__()
+        instance = BrowserInstance(crawler=crawler)
+        if self._closed:
+            await self._shutdown(instance)
+            raise RuntimeError("The browser pool was closed while the browser started")
+        self._instances.append(instance)
+        return instance
+
+    async def _shutdown(self, instance: BrowserInstance) -> None:
+        try:
+            await instance.crawler.__aexit__(None, None, None)
+        except Exception as e:
+            print(f'❌ Error closing browser: {str(e)}')
+
+    async def _recycle(self, instance: BrowserInstance) -> None:
+        """Close a retired instance and warm its replacement"""
+        if instance not in self._instances:
+            return
+        self._instances.remove(instance)
+        await self._shutdown(instance)
+        if not self._closed:
+            try:
+                await self.start()
+            except Exception as e:
+                print(f'❌ Could not warm a replacement browser: {str(e)}')
+
+    def _spawn(self, coro: Any) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+
+# Shared pool for the get website tool
+browser_pool = BrowserPool()
+
+
+async def warm_browser_pool() -> None:
+    try:
+        if browser_pool.crawler_factory is default_crawler:
+            # Importing crawl4ai and Playwright takes a while, keep it off the event loop
+            await asyncio.to_thread(importlib.import_module, "crawl4ai")
+        await browser_pool.start()
+    except Exception as e:
+        # Browsers are launched on demand instead, the rest of the app keeps working
+        print(f'❌ Could not warm the browser pool: {str(e)}')
+
+
+@on_startup
+async def start_browser_pool() -> None:
+    # In the background, so the server is ready without waiting for the browsers
+    if BROWSER_POOL_WARM:
+        browser_pool._spawn(warm_browser_pool())
+
+
+@on_shutdown
+async def close_browser_pool() -> None:
+    await browser_pool.close()
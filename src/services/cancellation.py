@@ -0,0 +1,137 @@
+import asyncio
+import functools
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from src.services.compaction import TOOL_POLICIES_FILE
+from src.services.metrics import CANCELLATIONS, HEDGED_REQUESTS
+
+# Seconds a guest message may take until it is answered, 0 for no limit
+TURN_DEADLINE = float(os.getenv("TURN_DEADLINE", "120"))
+
+T = TypeVar("T")
+ToolFunc = TypeVar("ToolFunc", bound=Callable[..., Awaitable[Any]])
+
+
+class TurnScopes:
+    """The running turn of every chat session, so it can be cancelled from outside.
+
+    A turn is the task handling one guest message. The agent run, the delegated
+    specialist runs, their tools, model streams and page loads all run in it or
+    in tasks it awaits (pydantic-ai gathers the tool calls of a response), so
+    cancelling it unwinds the whole tree at its next await. A new message of the
+    session cancels the previous turn, as do a disconnect and the stop button.
+    """
+
+    def __init__(self):
+        self._turns: Dict[str, asyncio.Task] = {}
+
+    @asynccontextmanager
+    async def turn(self, session_id: str, deadline: float = TURN_DEADLINE) -> AsyncIterator[None]:
+        """Run the block as the session's turn, cancelling the one before and within deadline"""
+        self.cancel(session_id, "new_message")
+        task = asyncio.current_task()
+        self._turns[session_id] = task
+        try:
+            async with asyncio.timeout(deadline or None) as scope:
+                yield
+        except TimeoutError:
+            if scope.expired():
+                CANCELLATIONS.inc(scope="turn", reason="deadline")
+            raise
+        finally:
+            if self._turns.get(session_id) is task:
+                del self._turns[session_id]
+
+    def cancel(self, session_id: str, reason: str) -> bool:
+        """Cancel the session's running turn, returning whether there was one"""
+        task = self._turns.pop(session_id, None)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        CANCELLATIONS.inc(scope="turn", reason=reason)
+        print(f'🛑 Cancelled the running turn of session {session_id} ({reason})')
+        return True
+
+
+def load_deadlines(path: str = TOOL_POLICIES_FILE) -> Dict[str, float]:
+    """Deadline in seconds by tool name from the tool policies, "default" for tools without one"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    default = data.get("default", {}).get("deadline_seconds", 0)
+    return {tool: settings.get("deadline_seconds", default) for tool, settings in data.items()}
+
+
+class ToolDeadlines:
+    """Per-tool time limits. A tool over its deadline is cancelled and the model told so,
+    leaving it the rest of the turn to answer with what it has."""
+
+    def __init__(self, deadlines: Dict[str, float]):
+        self.deadlines = deadlines
+
+    def deadline(self, tool: str) -> float:
+        return self.deadlines.get(tool, self.deadlines.get("default", 0))
+
+    def wrap(self, tool: ToolFunc, name: Optional[str] = None) -> ToolFunc:
+        """The tool cancelled after its deadline, with its signature and docstring for the schema"""
+        tool_name = name or tool.__name__
+        seconds = self.deadline(tool_name)
+
+        @functools.wraps(tool)
+        async def bounded_tool(*args: Any, **kwargs: Any) -> Any:
+            try:
+                async with asyncio.timeout(seconds or None) as scope:
+                    return await tool(*args, **kwargs)
+            except TimeoutError:
+                if not scope.expired():
+                    raise
+                CANCELLATIONS.inc(scope="tool", reason="deadline")
+                print(f'⏱️ {tool_name} cancelled after {seconds:g} seconds')
+                return f"{tool_name} did not finish within {seconds:g} seconds and was cancelled."
+
+        return bounded_tool  # type: ignore[return-value]
+
+
+async def hedged(
+    call: Callable[[], Awaitable[T]], delay: float, target: str, attempts: int = 2
+) -> T:
+    """Result of call, sending a backup call whenever the pending ones took longer than delay.
+
+    The first to succeed wins and the others are cancelled. With delay 0 it is a
+    plain call.
+    """
+    if delay <= 0 or attempts <= 1:
+        return await call()
+    first = asyncio.create_task(call())
+    pending: List[asyncio.Task] = [first]
+    started = 1
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=delay if started < attempts else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                pending.remove(task)
+                if task.exception() is None:
+                    if task is not first:
+                        HEDGED_REQUESTS.inc(target=target, outcome="won")
+                    return task.result()
+                error = task.exception()
+            if started < attempts and (not done or not pending):
+                # Too slow, or failed with nothing else in flight: send another
+                HEDGED_REQUESTS.inc(target=target, outcome="sent")
+                pending.append(asyncio.create_task(call()))
+                started += 1
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+turn_scopes = TurnScopes()
+tool_deadlines = ToolDeadlines(load_deadlines())
+with_deadline = tool_deadlines.wrap
@@ -0,0 +1,178 @@
+import functools
+import json
+import os
+from dataclasses import dataclass
+from dataclasses import fields as dataclass_fields
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from src.services.metrics import TOOL_RESULT_TOKENS
+from src.services.tokens import clip_to_tokens, count_tokens
+
+TOOL_POLICIES_FILE = os.getenv(
+    "TOOL_POLICIES_FILE",
+    os.path.join(os.path.dirname(__file__), "..", "data", "tool_policies.json"),
+)
+# Strings are not cut below this many characters when squeezing a result into its budget
+MIN_STRING_CHARS = 40
+
+ToolFunc = TypeVar("ToolFunc", bound=Callable[..., Awaitable[Any]])
+
+
+@dataclass(frozen=True)
+class CompactionPolicy:
+    """How the result of one tool is trimmed before it goes into the model context"""
+    fields: Optional[Tuple[str, ...]] = None  # keys kept of a result dict or of the dicts in a list
+    max_items: Optional[int] = None  # top-k of a result list, which tools return best first
+    max_string_chars: Optional[int] = None  # longer strings are cut
+    token_budget: Optional[int] = None  # hard cap on the serialized result, in model tokens
+
+
+def load_policies(path: str = TOOL_POLICIES_FILE) -> Dict[str, CompactionPolicy]:
+    """Policies by tool name, every tool's settings falling back to the "default" entry"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    names = {field.name for field in dataclass_fields(CompactionPolicy)}
+    default = data.pop("default", {})
+    policies = {}
+    for tool, settings in [("default", {}), *data.items()]:
+        merged = {**default, **settings}
+        if merged.get("fields") is not None:
+            merged["fields"] = tuple(merged["fields"])
+        policies[tool] = CompactionPolicy(
+            **{key: value for key, value in merged.items() if key in names}
+        )
+    return policies
+
+
+def _tokens(value: Any) -> int:
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    return count_tokens(value)
+
+
+def _project(value: Any, keep: Tuple[str, ...], dropped: Dict[str, int]) -> Any:
+    if not isinstance(value, dict):
+        return value
+    for key in value:
+        if key not in keep:
+            dropped[key] = dropped.get(key, 0) + 1
+    return {key: item for key, item in value.items() if key in keep}
+
+
+def _truncate(value: Any, limit: int) -> Tuple[Any, int]:
+    """Cut every string in value to limit characters, return the result and the characters cut"""
+    if isinstance(value, str):
+        if len(value) <= limit:
+            return value, 0
+        return value[: max(limit - 1, 0)].rstrip() + "…", len(value) - limit
+    if isinstance(value, dict):
+        pairs = [(key, _truncate(item, limit)) for key, item in value.items()]
+        return {key: item for key, (item, _) in pairs}, sum(cut for _, (_, cut) in pairs)
+    if isinstance(value, list):
+        items = [_truncate(item, limit) for item in value]
+        return [item for item, _ in items], sum(cut for _, cut in items)
+    return value, 0
+
+
+def _longest_string(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return max(map(_longest_string, value.values()), default=0)
+    if isinstance(value, list):
+        return max(map(_longest_string, value), default=0)
+    return 0
+
+
+class ToolOutputCompactor:
+    """Trims tool results by declarative per-tool policies before the model sees them.
+
+    Steps run cheapest first: field projection, top-k of lists, string
+    truncation, then the token budget, which drops trailing list items and
+    finally shortens strings until the serialized result fits. What was dropped
+    is logged so budgets can be tuned against answer quality.
+    """
+
+    def __init__(self, policies: Dict[str, CompactionPolicy]):
+        self.policies = policies
+
+    def policy(self, tool: str) -> CompactionPolicy:
+        return self.policies.get(tool) or self.policies.get("default") or CompactionPolicy()
+
+    def compact(self, tool: str, result: Any) -> Any:
+        policy = self.policy(tool)
+        notes: List[str] = []
+        before = _tokens(result)
+
+        if policy.fields is not None:
+            dropped_fields: Dict[str, int] = {}
+            if isinstance(result, list):
+                result = [_project(item, policy.fields, dropped_fields) for item in result]
+            else:
+                result = _project(result, policy.fields, dropped_fields)
+            if dropped_fields:
+                notes.append("fields " + ", ".join(sorted(dropped_fields)))
+
+        if (
+            policy.max_items is not None
+            and isinstance(result, list)
+            and len(result) > policy.max_items
+        ):
+            notes.append(f"{len(result) - policy.max_items} of {len(result)} items")
+            result = result[: policy.max_items]
+
+        if policy.max_string_chars is not None:
+            result, cut = _truncate(result, policy.max_string_chars)
+            if cut:
+                notes.append(f"{cut} chars of long strings")
+
+        after = _tokens(result)
+        if policy.token_budget is not None and after > policy.token_budget:
+            result, after = self._fit(result, policy.token_budget, after, notes)
+
+        TOOL_RESULT_TOKENS.inc(before, tool=tool, stage="raw")
+        TOOL_RESULT_TOKENS.inc(after, tool=tool, stage="kept")
+        if notes:
+            dropped = "; ".join(notes)
+            print(f'✂️ {tool} result compacted from {before} to {after} tokens, dropped {dropped}')
+        return result
+
+    def _fit(self, result: Any, budget: int, tokens: int, notes: List[str]) -> Tuple[Any, int]:
+        """Squeeze result into budget tokens"""
+        if isinstance(result, str):
+            notes.append(f"{tokens - budget} tokens over the budget of {budget}")
+            result = clip_to_tokens(result, budget)
+            return result, _tokens(result)
+
+        if isinstance(result, list) and len(result) > 1:
+            total = len(result)
+            while len(result) > 1 and tokens > budget:
+                result = result[:-1]
+                tokens = _tokens(result)
+            notes.append(f"{total - len(result)} trailing items over the budget of {budget}")
+
+        # Whatever is left is too big even as one item, shorten its strings step by step
+        limit = _longest_string(result)
+        cut_total = 0
+        while tokens > budget and limit > MIN_STRING_CHARS:
+            limit = max(limit // 2, MIN_STRING_CHARS)
+            result, cut = _truncate(result, limit)
+            cut_total += cut
+            tokens = _tokens(result)
+        if cut_total:
+            notes.append(f"{cut_total} chars to fit the budget of {budget}")
+        return result, tokens
+
+    def wrap(self, tool: ToolFunc, name: Optional[str] = None) -> ToolFunc:
+        """The tool with its result compacted, keeping its signature and docstring for the schema"""
+        tool_name = name or tool.__name__
+
+        @functools.wraps(tool)
+        async def compacted_tool(*args: Any, **kwargs: Any) -> Any:
+            return self.compact(tool_name, await tool(*args, **kwargs))
+
+        return compacted_tool  # type: ignore[return-value]
+
+
+tool_output_compactor = ToolOutputCompactor(load_policies())
+compacted = tool_output_compactor.wrap
@@ -0,0 +1,241 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from src.services.lifecycle import on_shutdown
+from src.services.metrics import CallbackGauge, Counter, Histogram
+
+# Append-only SQLite file (WAL mode) of the turns and delegations of every session. It holds full
+# guest transcripts, so it is off unless a path is set
+EVENT_LOG_DB = os.getenv("EVENT_LOG_DB", "")
+# Events waiting to be written, producers wait for room beyond this
+EVENT_LOG_QUEUE_SIZE = int(os.getenv("EVENT_LOG_QUEUE_SIZE", "10000"))
+# Most events written in one transaction
+EVENT_LOG_BATCH_SIZE = int(os.getenv("EVENT_LOG_BATCH_SIZE", "500"))
+# Seconds a producer waits for room in a full queue before its event is dropped
+EVENT_LOG_MAX_WAIT = float(os.getenv("EVENT_LOG_MAX_WAIT", "0.5"))
+# Seconds before a batch that failed to write is tried again
+EVENT_LOG_RETRY_DELAY = 1.0
+
+
+@dataclass
+class Event:
+    """Something that happened in a session, e.g. a turn or a delegation with its result"""
+    session_id: str
+    kind: str
+    data: Dict[str, Any]
+    at: float = field(default_factory=time.time)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+
+class EventLog:
+    """Append-only log of every session, written behind the guest's back.
+
+    record() puts the event in memory and returns. One writer task drains the
+    queue and commits everything waiting in a single transaction, so a burst of
+    events costs one disk sync (group commit). When the disk falls behind and the
+    queue is full, producers wait up to max_wait for room; after that the event is
+    dropped and counted rather than holding up the guest. A session's history is
+    read from an index on the session and includes events not written yet.
+    """
+
+    def __init__(
+        self,
+        path: str = EVENT_LOG_DB,
+        capacity: int = EVENT_LOG_QUEUE_SIZE,
+        batch_size: int = EVENT_LOG_BATCH_SIZE,
+        max_wait: float = EVENT_LOG_MAX_WAIT,
+    ):
+        self.path = path
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue: Deque[Event] = deque()
+        self._writing: List[Event] = []  # batch the writer is committing
+        self._writer: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._room: Optional[asyncio.Event] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue) + len(self._writing)
+
+    async def record(self, session_id: str, kind: str, data: Dict[str, Any]) -> None:
+        """Queue an event for writing, only waiting when the queue is full"""
+        if not self.enabled:
+            return
+        self._start()
+        if len(self._queue) >= self.capacity:
+            try:
+                async with asyncio.timeout(self.max_wait):
+                    while len(self._queue) >= self.capacity:
+                        self._room.clear()
+                        await self._room.wait()
+            except TimeoutError:
+                EVENT_LOG_EVENTS.inc(outcome="dropped")
+                print(f'❌ Event log queue full, dropped a {kind} event of session {session_id}')
+                return
+        self._queue.append(Event(session_id=session_id, kind=kind, data=data))
+        EVENT_LOG_EVENTS.inc(outcome="queued")
+        self._ready.set()
+
+    async def history(
+        self, session_id: str, kinds: Optional[Sequence[str]] = None, limit: Optional[int] = None
+    ) -> List[Event]:
+        """The session's events oldest first, the last limit of them if given"""
+        if not self.enabled:
+            return []
+        # Taken before reading, an event committed meanwhile is read and skipped here by its id
+        pending = [
+            event for event in (*self._writing, *self._queue)
+            if event.session_id == session_id and (kinds is None or event.kind in kinds)
+        ]
+        events = await asyncio.to_thread(self._run, self._read, session_id, kinds, limit)
+        written = {event.id for event in events}
+        events.extend(event for event in pending if event.id not in written)
+        return events[-limit:] if limit else events
+
+    async def close(self) -> None:
+        """Stop the writer and write whatever is still queued"""
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        # The batch being written when the writer stopped may already be committed, its ids keep
+        # it from being stored twice
+        remaining = [*self._writing, *self._queue]
+        self._writing, self._queue = [], deque()
+        if remaining:
+            await asyncio.to_thread(self._run, self._write, remaining)
+            EVENT_LOG_EVENTS.inc(len(remaining), outcome="written")
+        if self._db is not None:
+            await asyncio.to_thread(self._run, lambda db: db.close())
+            self._db = None
+
+    def _start(self) -> None:
+        if self._writer is None or self._writer.done():
+            self._ready = asyncio.Event()
+            self._room = asyncio.Event()
+            if self._queue:
+                self._ready.set()
+            self._writer = asyncio.create_task(self._write_behind())
+
+    async def _write_behind(self) -> None:
+        while True:
+            await self._ready.wait()
+            # Everything that arrived during the last commit goes into this one
+            count = min(len(self._queue), self.batch_size)
+            self._writing = [self._queue.popleft() for _ in range(count)]
+            if not self._queue:
+                self._ready.clear()
+            self._room.set()
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._run, self._write, self._writing)
+            except Exception as e:
+                EVENT_LOG_EVENTS.inc(len(self._writing), outcome="retried")
+                print(f'❌ Event log write failed, retrying: {str(e)}')
+                self._queue.extendleft(reversed(self._writing))
+                self._writing = []
+                self._ready.set()
+                await asyncio.sleep(EVENT_LOG_RETRY_DELAY)
+                continue
+            EVENT_LOG_FLUSH_SECONDS.observe(time.perf_counter() - started)
+            EVENT_LOG_EVENTS.inc(len(self._writing), outcome="written")
+            self._writing = []
+
+    def _run(self, operation: Any, *args: Any) -> Any:
+        with self._db_lock:
+            if self._db is None:
+                self._db = self._connect()
+            return operation(self._db, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        # Appends never block readers, and a commit only syncs the write-ahead log at checkpoints
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS events "
+            "(seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL UNIQUE, "
+            "session_id TEXT NOT NULL, at REAL NOT NULL, kind TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS events_by_session ON events (session_id, seq)")
+        db.commit()
+        return db
+
+    @staticmethod
+    def _write(db: sqlite3.Connection, events: List[Event]) -> None:
+        with db:
+            db.executemany(
+                "INSERT OR IGNORE INTO events (id, session_id, at, kind, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        event.id, event.session_id, event.at, event.kind,
+                        json.dumps(event.data, default=str),
+                    )
+                    for event in events
+                ],
+            )
+
+    @staticmethod
+    def _read(
+        db: sqlite3.Connection,
+        session_id: str,
+        kinds: Optional[Sequence[str]],
+        limit: Optional[int],
+    ) -> List[Event]:
+        query = "SELECT id, session_id, at, kind, data FROM events WHERE session_id = ?"
+        params: List[Any] = [session_id]
+        if kinds is not None:
+            query += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        query += " ORDER BY seq DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = db.execute(query, params).fetchall()
+        return [
+            Event(id=id, session_id=session, at=at, kind=kind, data=json.loads(data))
+            for id, session, at, kind, data in reversed(rows)
+        ]
+
+
+event_log = EventLog()
+
+EVENT_LOG_EVENTS = Counter(
+    "hotel_event_log_events_total",
+    "Session events by outcome: queued, written, retried or dropped",
+    ["outcome"],
+)
+EVENT_LOG_FLUSH_SECONDS = Histogram(
+    "hotel_event_log_flush_seconds", "Duration of the event log's batched writes"
+)
+EVENT_LOG_DEPTH = CallbackGauge(
+    "hotel_event_log_depth",
+    "Session events waiting to be written",
+    [],
+    lambda: {(): event_log.depth},
+)
+
+
+@on_shutdown
+async def close_event_log() -> None:
+    await event_log.close()
@@ -0,0 +1,139 @@
+import math
+import os
+import re
+from collections import Counter
+from typing import List
+
+from src.services.tokens import clip_to_tokens, count_tokens
+
+# Tokens of page content handed to the model per website call
+WEBSITE_TOKEN_BUDGET = int(os.getenv("WEBSITE_TOKEN_BUDGET", "1500"))
+# Target size of the chunks a page is split into before ranking
+WEBSITE_CHUNK_TOKENS = int(os.getenv("WEBSITE_CHUNK_TOKENS", "200"))
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+LINK_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+HEADING_RE = re.compile(r"^#{1,6}\s")
+# Lines that are almost always site chrome rather than content
+BOILERPLATE_RE = re.compile(
+    r"cookie|privacy policy|terms of (use|service)|all rights reserved|©|skip to (main )?content|"
+    r"newsletter|sign in|log in|subscribe|accept all",
+    re.IGNORECASE,
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in WORD_RE.findall(text.lower()) if len(word) > 1]
+
+
+def strip_boilerplate(markdown: str) -> str:
+    """Drop navigation, link lists, images and repeated site chrome from crawled markdown"""
+    seen = set()
+    lines = []
+    for line in markdown.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            lines.append("")
+            continue
+        # Keep link text but not the URLs, and measure how much of the line was links
+        text = LINK_RE.sub(lambda m: m.group(1), stripped)
+        link_chars = sum(len(m.group(0)) for m in LINK_RE.finditer(stripped))
+        if link_chars > 0.6 * len(stripped) and not HEADING_RE.match(stripped):
+            continue  # navigation bars and link lists
+        if BOILERPLATE_RE.search(text) and len(text) < 200:
+            continue
+        if len(tokenize(text)) < 2 and not HEADING_RE.match(stripped):
+            continue  # stray buttons and separators
+        if text in seen:
+            continue  # headers and footers repeated across the page
+        seen.add(text)
+        lines.append(text)
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def split_chunks(text: str, chunk_tokens: int = WEBSITE_CHUNK_TOKENS) -> List[str]:
+    """Split text into roughly chunk_tokens sized chunks along headings and paragraphs"""
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    heading = ""
+
+    # Blank lines and headings both start a new paragraph
+    for paragraph in re.split(r"\n\s*\n|\n(?=#{1,6}\s)", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = count_tokens(paragraph)
+        starts_section = HEADING_RE.match(paragraph) is not None
+        if current and (starts_section or current_tokens + tokens > chunk_tokens):
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        if starts_section:
+            heading = paragraph.splitlines()[0]
+        elif not current and heading:
+            # Repeat the section heading so the chunk stands on its own
+            current.append(heading)
+            current_tokens += count_tokens(heading)
+        current.append(clip_to_tokens(paragraph, chunk_tokens))
+        current_tokens += min(tokens, chunk_tokens)
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def bm25_scores(query: str, chunks: List[str], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """Okapi BM25 score of every chunk against the query"""
+    documents = [Counter(tokenize(chunk)) for chunk in chunks]
+    if not documents:
+        return []
+    lengths = [sum(document.values()) for document in documents]
+    average_length = sum(lengths) / len(lengths) or 1.0
+    query_terms = set(tokenize(query))
+    idf = {}
+    for term in query_terms:
+        containing = sum(1 for document in documents if term in document)
+        idf[term] = math.log((len(documents) - containing + 0.5) / (containing + 0.5) + 1)
+
+    scores = []
+    for document, length in zip(documents, lengths, strict=False):
+        score = 0.0
+        for term in query_terms:
+            frequency = document.get(term, 0)
+            if not frequency:
+                continue
+            saturation = frequency + k1 * (1 - b + b * length / average_length)
+            score += idf[term] * frequency * (k1 + 1) / saturation
+        scores.append(score)
+    return scores
+
+
+def extract_relevant(markdown: str, query: str, token_budget: int = WEBSITE_TOKEN_BUDGET) -> str:
+    """Return the parts of a page most relevant to the query, within the token budget"""
+    chunks = split_chunks(strip_boilerplate(markdown))
+    if not chunks:
+        return ""
+
+    scores = bm25_scores(query, chunks)
+    # Without any matching terms, the top of the page is the best guess
+    if not any(scores):
+        ranked = list(range(len(chunks)))
+    else:
+        # Chunks without a single query term are left out
+        ranked = sorted(
+            (i for i in range(len(chunks)) if scores[i] > 0), key=lambda i: (-scores[i], i)
+        )
+
+    selected: List[int] = []
+    used = 0
+    for i in ranked:
+        tokens = count_tokens(chunks[i])
+        if used + tokens > token_budget:
+            continue
+        selected.append(i)
+        used += tokens
+
+    if not selected:
+        return clip_to_tokens(chunks[ranked[0]], token_budget)
+    # Keep the page order so the excerpt reads naturally
+    return "\n\n[...]\n\n".join(chunks[i] for i in sorted(selected))
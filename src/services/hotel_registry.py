@@ -0,0 +1,167 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from src.models.hotel_models import Location
+from src.services.menu_catalog import MENU_FILE, MenuCatalog
+from src.services.service_matcher import SERVICES_FILE, ServiceMatcher
+
+# One directory per property: hotel.json (location, optional service_hours), and optionally its own
+# menu.json and services.json, otherwise the shared MENU_FILE and SERVICES_FILE are used
+HOTELS_DIR = os.getenv(
+    "HOTELS_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "hotels")
+)
+# Property of sessions that do not name one
+DEFAULT_HOTEL = os.getenv("DEFAULT_HOTEL", "funkhaus")
+# Properties kept loaded with their derived artifacts, the least recently used are evicted first
+HOTEL_CACHE_SIZE = int(os.getenv("HOTEL_CACHE_SIZE", "32"))
+# Seconds between checks of a loaded property's files for changes
+HOTEL_RELOAD_INTERVAL = float(os.getenv("HOTEL_RELOAD_INTERVAL", "5"))
+
+T = TypeVar("T")
+
+
+@dataclass
+class Hotel:
+    """A property with its catalogs and whatever else was derived from its data"""
+    id: str
+    location: Location
+    menu: MenuCatalog
+    services: ServiceMatcher
+    version: Tuple[float, ...]  # modification times of the files it was loaded from
+    checked_at: float = field(default_factory=time.monotonic)
+    artifacts: Dict[str, Any] = field(default_factory=dict)
+
+    def artifact(self, name: str, build: Callable[[], T]) -> T:
+        """Derived data (prompt prefixes, intent router, ...), built once per loaded version"""
+        value = self.artifacts.get(name)
+        if value is None:
+            value = self.artifacts[name] = build()
+        return value
+
+
+class HotelRegistry:
+    """Properties served by this deployment, loaded on first use from HOTELS_DIR.
+
+    Looking up a loaded property is a dictionary access, so the cost of a message
+    does not grow with the number of properties. At most capacity properties stay
+    loaded; a property whose files changed is reloaded on its next lookup, checked
+    at most every reload_interval seconds. A property that fails to reload keeps its
+    last loaded copy, and one whose directory was removed is served as the default.
+    """
+
+    def __init__(
+        self,
+        directory: str = HOTELS_DIR,
+        default: str = DEFAULT_HOTEL,
+        capacity: int = HOTEL_CACHE_SIZE,
+        reload_interval: float = HOTEL_RELOAD_INTERVAL,
+    ):
+        self.directory = directory
+        self.default = default
+        self.capacity = capacity
+        self.reload_interval = reload_interval
+        self._hotels: OrderedDict[str, Hotel] = OrderedDict()
+        # Catalogs of the shared files by path, with the modification time they were loaded at
+        self._shared: Dict[str, Tuple[float, Any]] = {}
+
+    def ids(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.directory) if self.exists(name))
+
+    def exists(self, hotel_id: str) -> bool:
+        return os.path.isfile(os.path.join(self.directory, hotel_id, "hotel.json"))
+
+    def loaded(self) -> List[Hotel]:
+        return list(self._hotels.values())
+
+    def get(self, hotel_id: Optional[str] = None) -> Hotel:
+        """The property, loading or reloading it as needed"""
+        hotel_id = hotel_id or self.default
+        hotel = self._hotels.get(hotel_id)
+        if hotel is not None:
+            now = time.monotonic()
+            if now - hotel.checked_at >= self.reload_interval:
+                hotel.checked_at = now
+                if self._version(hotel_id) != hotel.version:
+                    hotel = self._reload(hotel)
+        if hotel is None:
+            if hotel_id != self.default and not self.exists(hotel_id):
+                # Removed while sessions were still on it, they carry on as the default property
+                print(f'⚠️ Unknown hotel {hotel_id}, serving it as {self.default}')
+                self._hotels.pop(hotel_id, None)
+                return self.get()
+            hotel = self._load(hotel_id)
+            self._hotels[hotel_id] = hotel
+            while len(self._hotels) > self.capacity:
+                self._hotels.popitem(last=False)
+        self._hotels.move_to_end(hotel_id)
+        return hotel
+
+    def warm(self) -> List[Hotel]:
+        """Load the default property and as many others as the cache holds"""
+        others = [hotel_id for hotel_id in self.ids() if hotel_id != self.default]
+        hotel_ids = [self.default] + others
+        return [self.get(hotel_id) for hotel_id in reversed(hotel_ids[: self.capacity])]
+
+    def _paths(self, hotel_id: str) -> Tuple[str, str, str]:
+        """hotel.json, and the menu and service catalog files the property uses"""
+        directory = os.path.join(self.directory, hotel_id)
+        menu = os.path.join(directory, "menu.json")
+        services = os.path.join(directory, "services.json")
+        return (
+            os.path.join(directory, "hotel.json"),
+            menu if os.path.isfile(menu) else MENU_FILE,
+            services if os.path.isfile(services) else SERVICES_FILE,
+        )
+
+    def _version(self, hotel_id: str) -> Tuple[float, ...]:
+        try:
+            return tuple(os.path.getmtime(path) for path in self._paths(hotel_id))
+        except OSError:
+            return ()
+
+    def _reload(self, hotel: Hotel) -> Optional[Hotel]:
+        """The property loaded again from its changed files, None once they are gone"""
+        if hotel.id != self.default and not self.exists(hotel.id):
+            return None
+        print(f'🔄 Reloading hotel {hotel.id}, its data changed')
+        try:
+            return self._load(hotel.id)
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            # Files caught mid-write or broken, tried again at the next check
+            print(f'❌ Reloading hotel {hotel.id} failed, keeping the last loaded copy: {str(e)}')
+            return hotel
+
+    def _load(self, hotel_id: str) -> Hotel:
+        if not self.exists(hotel_id):
+            raise KeyError(f"Unknown hotel: {hotel_id}")
+        hotel_file, menu_file, services_file = self._paths(hotel_id)
+        version = self._version(hotel_id)
+        with open(hotel_file, encoding="utf-8") as f:
+            data = json.load(f)
+
+        location = data["location"]
+        location = Location(**{**location, "coordinates": tuple(location["coordinates"])})
+        menu = self._catalog(menu_file, MenuCatalog.from_file)
+        if "service_hours" in data:
+            # Same menu, the property's own opening hours
+            menu = MenuCatalog(menu.items, data["service_hours"])
+        services = self._catalog(services_file, ServiceMatcher.from_file)
+        print(f'🏨 Loaded hotel {hotel_id} ({location.name})')
+        return Hotel(id=hotel_id, location=location, menu=menu, services=services, version=version)
+
+    def _catalog(self, path: str, load: Callable[[str], T]) -> T:
+        """Load a catalog file; the shared ones are indexed once for every property using them"""
+        if path not in (MENU_FILE, SERVICES_FILE):
+            return load(path)
+        modified = os.path.getmtime(path)
+        cached = self._shared.get(path)
+        if cached is None or cached[0] != modified:
+            cached = self._shared[path] = (modified, load(path))
+        return cached[1]
+
+
+hotel_registry = HotelRegistry()
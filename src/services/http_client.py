@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+import random
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from src.services.lifecycle import on_shutdown
+
+if TYPE_CHECKING:
+    import aiohttp
+
+# Connection pool limits
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+# Deadlines in seconds
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+HTTP_TOTAL_TIMEOUT = float(os.getenv("HTTP_TOTAL_TIMEOUT", "30"))
+# Retries on 429, 5xx and connection errors
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "8"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class HttpResponse:
+    """A fully read response, the connection is already back in the pool"""
+    status: int
+    text: str
+    headers: Dict[str, str]
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class HttpClient:
+    """Application scoped aiohttp session with pooling, deadlines and retries"""
+
+    def __init__(self):
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    async def start(self) -> None:
+        if self._session is not None and not self._session.closed:
+            return
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=HTTP_TOTAL_TIMEOUT,
+            sock_connect=HTTP_CONNECT_TIMEOUT,
+            sock_read=HTTP_READ_TIMEOUT,
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        max_retries: int = HTTP_MAX_RETRIES,
+        **kwargs: Any
+    ) -> HttpResponse:
+        """Send a request, retrying with jittered backoff on 429, 5xx and connection errors"""
+        # Started with the first request, so aiohttp is only loaded once a tool goes out to the web
+        await self.start()
+        import aiohttp  # already loaded by start, for the exception types
+
+        attempt = 0
+        while True:
+            try:
+                async with self._session.request(method, url, **kwargs) as response:
+                    text = await response.text()
+                    result = HttpResponse(
+                        status=response.status, text=text, headers=dict(response.headers)
+                    )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= max_retries:
+                    raise
+                result = None
+
+            final = result is not None and (
+                result.status not in RETRY_STATUSES or attempt >= max_retries
+            )
+            if final:
+                return result
+
+            await asyncio.sleep(self._backoff(attempt, result))
+            attempt += 1
+
+    async def get(self, url: str, **kwargs: Any) -> HttpResponse:
+        return await self.request("GET", url, **kwargs)
+
+    def _backoff(self, attempt: int, response: Optional[HttpResponse]) -> float:
+        """Full jitter backoff, honouring Retry-After when the server sends one"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), HTTP_BACKOFF_MAX)
+        return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+# Shared client for all outbound tool calls
+http_client = HttpClient()
+
+
+@on_shutdown
+async def close_http_client() -> None:
+    await http_client.close()
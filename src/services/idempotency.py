@@ -0,0 +1,136 @@
+import hashlib
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from typing import Dict, Set
+
+from src.services.session_store import SESSION_STATE_BACKEND, SessionStore, session_store
+
+# Seconds a delegated request counts as a duplicate
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "3600"))
+# Hard cap on remembered fingerprints, the least recently used are evicted first
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+
+def fingerprint(request_type: str, description: str) -> str:
+    """Short hash of a request, insensitive to case, punctuation and spacing"""
+    normalized = " ".join(re.sub(r"[^\w\s]", " ", description.lower()).split())
+    return hashlib.sha256(f"{request_type.lower()}:{normalized}".encode()).hexdigest()[:16]
+
+
+class IdempotencyBackend(ABC):
+    """Storage for request fingerprints, grouped by scope (session and room)"""
+
+    @abstractmethod
+    async def add(self, scope: str, key: str, ttl: float) -> bool:
+        """Remember key in scope, returning False if it was already there and not expired"""
+
+    @abstractmethod
+    async def discard(self, scope: str, key: str) -> None:
+        """Forget one key of a scope"""
+
+    @abstractmethod
+    async def clear(self, scope: str) -> None:
+        """Forget every key of a scope"""
+
+
+class MemoryIdempotencyBackend(IdempotencyBackend):
+    """In-process backend with TTL expiry, evicting the least recently used beyond max_entries.
+
+    A repeated request counts as a use and restarts its window, unlike the session
+    store backend, where the window runs from the first request.
+    """
+
+    def __init__(self, max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._expiry: OrderedDict[tuple[str, str], float] = OrderedDict()
+        self._scopes: Dict[str, Set[str]] = defaultdict(set)
+
+    async def add(self, scope: str, key: str, ttl: float) -> bool:
+        entry = (scope, key)
+        now = time.time()
+        expires_at = self._expiry.get(entry)
+        duplicate = expires_at is not None and expires_at > now
+
+        self._expiry[entry] = now + ttl
+        self._expiry.move_to_end(entry)
+        self._scopes[scope].add(key)
+        if duplicate:
+            return False
+
+        # Entries are ordered by last use and share one TTL, so they expire front first
+        while self._expiry:
+            (old_scope, old_key), old_expiry = next(iter(self._expiry.items()))
+            if old_expiry > now and len(self._expiry) <= self.max_entries:
+                break
+            del self._expiry[(old_scope, old_key)]
+            self._discard(old_scope, old_key)
+        return True
+
+    async def discard(self, scope: str, key: str) -> None:
+        if self._expiry.pop((scope, key), None) is not None:
+            self._discard(scope, key)
+
+    async def clear(self, scope: str) -> None:
+        for key in self._scopes.pop(scope, set()):
+            self._expiry.pop((scope, key), None)
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def _discard(self, scope: str, key: str) -> None:
+        keys = self._scopes.get(scope)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._scopes[scope]
+
+
+class SessionStoreIdempotencyBackend(IdempotencyBackend):
+    """Backend on the shared session store, so every worker sees the same fingerprints"""
+
+    def __init__(self, store: SessionStore):
+        self.store = store
+
+    async def add(self, scope: str, key: str, ttl: float) -> bool:
+        return await self.store.add(f"dedup:{scope}:{key}", True, ttl)
+
+    async def discard(self, scope: str, key: str) -> None:
+        # Fingerprints all have the same length, so the only key with this prefix is this one
+        await self.store.delete_prefix(f"dedup:{scope}:{key}")
+
+    async def clear(self, scope: str) -> None:
+        await self.store.delete_prefix(f"dedup:{scope}:")
+
+
+class IdempotencyStore:
+    """Detects requests that were already delegated in the same session and room"""
+
+    def __init__(self, backend: IdempotencyBackend, ttl: float = IDEMPOTENCY_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def scope(session_id: str, room_number: str) -> str:
+        return f"{session_id}:{room_number}"
+
+    async def first_time(self, scope: str, request_type: str, description: str) -> bool:
+        """Mark the request as processed, returning False when it is a duplicate"""
+        return await self.backend.add(scope, fingerprint(request_type, description), self.ttl)
+
+    async def release(self, scope: str, request_type: str, description: str) -> None:
+        """Forget a request that did not complete, so the guest can make it again"""
+        await self.backend.discard(scope, fingerprint(request_type, description))
+
+    async def reset(self, scope: str) -> None:
+        await self.backend.clear(scope)
+
+
+# A single process keeps fingerprints in its own bounded index, several share the session store
+idempotency_store = IdempotencyStore(
+    MemoryIdempotencyBackend()
+    if SESSION_STATE_BACKEND == "memory"
+    else SessionStoreIdempotencyBackend(session_store)
+)
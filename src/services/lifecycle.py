@@ -0,0 +1,55 @@
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, List
+
+# Coroutines run when the Chainlit server starts and stops
+startup_hooks: List[Callable[[], Awaitable[Any]]] = []
+shutdown_hooks: List[Callable[[], Awaitable[Any]]] = []
+
+
+def on_startup(func: Callable[[], Awaitable[Any]]) -> Callable[[], Awaitable[Any]]:
+    """Register a coroutine to run when the app starts"""
+    startup_hooks.append(func)
+    return func
+
+
+def on_shutdown(func: Callable[[], Awaitable[Any]]) -> Callable[[], Awaitable[Any]]:
+    """Register a coroutine to run when the app shuts down"""
+    shutdown_hooks.append(func)
+    return func
+
+
+async def startup() -> None:
+    for hook in startup_hooks:
+        await hook()
+
+
+async def shutdown() -> None:
+    # Tear down in reverse order so later subsystems can still use earlier ones
+    for hook in reversed(shutdown_hooks):
+        try:
+            await hook()
+        except Exception as e:
+            print(f'❌ Shutdown hook {hook.__name__} failed: {str(e)}')
+
+
+def install(app: Any) -> None:
+    """Run the registered hooks inside the lifespan of the Chainlit FastAPI app.
+
+    Chainlit 2.2 has no app startup/shutdown callbacks, so the server's lifespan
+    context is wrapped instead. Safe to call again when Chainlit reloads the module.
+    """
+    if getattr(app.state, "lifecycle_installed", False):
+        return
+    app.state.lifecycle_installed = True
+    chainlit_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(server_app: Any):
+        async with chainlit_lifespan(server_app) as state:
+            await startup()
+            try:
+                yield state
+            finally:
+                await shutdown()
+
+    app.router.lifespan_context = lifespan
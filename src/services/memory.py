@@ -0,0 +1,206 @@
+import asyncio
+import os
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Any, Awaitable, Callable
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelRequestPart,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    UserPromptPart,
+)
+
+from src.services.admission import BACKGROUND, AdmittedModel, prioritized
+from src.services.metrics import InstrumentedModel
+from src.services.tokens import clip_to_tokens, count_tokens
+
+# Token budget for the summary plus the verbatim turns sent with every request
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "1500"))
+# Number of most recent turns that are always kept verbatim
+MEMORY_MIN_RECENT_TURNS = int(os.getenv("MEMORY_MIN_RECENT_TURNS", "2"))
+# Upper bound for the rolling summary of older turns
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "300"))
+MEMORY_SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL", "openai:gpt-4o-mini")
+# Heads the guest's message in a prompt that carries the earlier turns
+NEW_MESSAGE_HEADER = "Guest's new message:"
+
+
+@lru_cache(maxsize=None)
+def get_summary_agent() -> Agent[None, str]:
+    """Small agent that folds older turns into the rolling summary, built on first compaction"""
+    return Agent(
+        AdmittedModel(InstrumentedModel(MEMORY_SUMMARY_MODEL, agent='summary')),
+        name='summary',
+        result_type=str,
+        system_prompt=(
+            'You maintain a running summary of a conversation between a hotel guest and the hotel '
+            'concierge team. Merge the existing summary with the new conversation turns into one '
+            'updated summary.\n\n'
+
+            'Keep:\n'
+            '- Requests the guest made and whether they were fulfilled\n'
+            '- Orders, bookings and promised times\n'
+            '- Guest preferences, dietary needs and personal details they shared\n\n'
+
+            f'Write plain sentences, no more than {MEMORY_SUMMARY_TOKENS // 2} words.'
+        ),
+    )
+
+
+@dataclass
+class Turn:
+    """One guest message and the reply that was sent back"""
+    user: str
+    assistant: str
+
+    @property
+    def tokens(self) -> int:
+        return count_tokens(self.user) + count_tokens(self.assistant)
+
+
+@dataclass
+class ConversationMemory:
+    """Conversation history for a single chat session.
+
+    Recent turns are kept verbatim, older ones are folded into a rolling summary
+    so the history sent to the model stays within the token budget. Only the guest
+    messages and final replies are stored, tool calls and their payloads are not.
+    """
+    token_budget: int = MEMORY_TOKEN_BUDGET
+    min_recent_turns: int = MEMORY_MIN_RECENT_TURNS
+    system_prompts: list[str] = field(default_factory=list)
+    # dynamic_ref of each system prompt, the agent rebuilds those on every run (None if static)
+    system_prompt_refs: list[str | None] = field(default_factory=list)
+    summary: str = ""
+    turns: list[Turn] = field(default_factory=list)
+    _lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+    _compaction: asyncio.Task | None = field(default=None, repr=False)
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON serializable state, for the shared session store"""
+        return {
+            "system_prompts": self.system_prompts,
+            "system_prompt_refs": self.system_prompt_refs,
+            "summary": self.summary,
+            "turns": [asdict(turn) for turn in self.turns],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ConversationMemory":
+        return cls(
+            system_prompts=list(data.get("system_prompts", [])),
+            system_prompt_refs=list(data.get("system_prompt_refs", [])),
+            summary=data.get("summary", ""),
+            turns=[Turn(**turn) for turn in data.get("turns", [])],
+        )
+
+    def capture_system_prompts(self, messages: list[ModelMessage]) -> None:
+        """Remember the system prompts of a run so they can head the compacted history"""
+        if self.system_prompts or not messages or not isinstance(messages[0], ModelRequest):
+            return
+        parts = [part for part in messages[0].parts if isinstance(part, SystemPromptPart)]
+        self.system_prompts = [part.content for part in parts]
+        # The hotel's prompt prefix is rebuilt from its ref, so a reloaded property takes effect
+        self.system_prompt_refs = [part.dynamic_ref for part in parts]
+
+    def add_turn(self, user: str, assistant: str) -> None:
+        """Record a completed turn"""
+        self.turns.append(Turn(user=user, assistant=assistant))
+
+    @property
+    def tokens(self) -> int:
+        """Tokens currently held by the summary and the verbatim turns"""
+        return count_tokens(self.summary) + sum(turn.tokens for turn in self.turns)
+
+    def history(self) -> list[ModelMessage]:
+        """Build the message history to pass to the next run"""
+        # Without the system prompts the agent would run without its instructions
+        if not self.system_prompts:
+            return []
+
+        refs = self.system_prompt_refs or [None] * len(self.system_prompts)
+        head: list[ModelRequestPart] = [
+            SystemPromptPart(prompt, dynamic_ref=ref)
+            for prompt, ref in zip(self.system_prompts, refs, strict=True)
+        ]
+        if self.summary:
+            summary = f'Summary of the earlier conversation with the guest:\n{self.summary}'
+            head.append(SystemPromptPart(summary))
+
+        messages: list[ModelMessage] = []
+        for turn in self.turns:
+            messages.append(ModelRequest(parts=[*head, UserPromptPart(turn.user)]))
+            messages.append(ModelResponse(parts=[TextPart(turn.assistant)]))
+            head = []
+        if head:
+            messages.append(ModelRequest(parts=head))
+        return messages
+
+    def prompt_with_context(self, prompt: str, history: bool = True) -> str:
+        """Carry the earlier turns inside the prompt when they cannot be sent as history.
+
+        This happens for a specialist the router sends the message to (history=False),
+        and when every turn so far was answered by a specialist directly, so the
+        supervisor's system prompts have not been captured yet.
+        """
+        if (history and self.system_prompts) or not (self.summary or self.turns):
+            return prompt
+        earlier = "\n".join(f"Guest: {turn.user}\nHotel: {turn.assistant}" for turn in self.turns)
+        if self.summary:
+            earlier = f"{self.summary}\n{earlier}"
+        return f"Earlier in this conversation:\n{earlier}\n\n{NEW_MESSAGE_HEADER}\n{prompt}"
+
+    def schedule_compaction(self, on_compacted: Callable[[], Awaitable[Any]] | None = None) -> None:
+        """Compact in the background so the guest never waits for the summary"""
+        if self.tokens <= self.token_budget:
+            return
+        if self._compaction is None or self._compaction.done():
+            self._compaction = asyncio.create_task(self._compact_then(on_compacted))
+
+    async def _compact_then(self, on_compacted: Callable[[], Awaitable[Any]] | None) -> None:
+        # Summaries are never urgent, guests' requests go first when the rate limits are tight
+        with prioritized(BACKGROUND):
+            await self.compact()
+        if on_compacted is not None:
+            await on_compacted()
+
+    async def compact(self) -> None:
+        """Fold the oldest turns into the summary until the history fits the budget"""
+        async with self._lock:
+            evict = 0
+            tokens = self.tokens
+            while tokens > self.token_budget and len(self.turns) - evict > self.min_recent_turns:
+                tokens -= self.turns[evict].tokens
+                evict += 1
+
+            if evict:
+                evicted = self.turns[:evict]
+                self.summary = await self._summarize(evicted)
+                # Turns recorded while summarizing were appended, so slicing the front is safe
+                self.turns = self.turns[evict:]
+
+            # Recent turns that are still over budget on their own get clipped
+            if self.tokens > self.token_budget and self.turns:
+                available = self.token_budget - count_tokens(self.summary)
+                share = max(available // (2 * len(self.turns)), 1)
+                for turn in self.turns:
+                    turn.user = clip_to_tokens(turn.user, share)
+                    turn.assistant = clip_to_tokens(turn.assistant, share)
+
+    async def _summarize(self, turns: list[Turn]) -> str:
+        """Merge the evicted turns into the existing summary"""
+        transcript = "\n".join(f"Guest: {turn.user}\nHotel: {turn.assistant}" for turn in turns)
+        prompt = f"Existing summary:\n{self.summary or '(none)'}\n\nNew turns:\n{transcript}"
+        try:
+            result = await get_summary_agent().run(prompt)
+            summary = result.data
+        except Exception as e:
+            # Keep the conversation going with a plain extract rather than losing the turns
+            print(f'❌ Summarization failed: {str(e)}')
+            summary = f"{self.summary}\n{transcript}".strip()
+        return clip_to_tokens(summary, MEMORY_SUMMARY_TOKENS)
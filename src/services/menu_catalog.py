@@ -0,0 +1,156 @@
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, time
+from typing import Dict, List, Optional, Set
+
+from src.services.text import tokenize
+
+MENU_FILE = os.getenv(
+    "MENU_FILE", os.path.join(os.path.dirname(__file__), "..", "data", "menu.json")
+)
+# Items returned per search
+MENU_SEARCH_LIMIT = int(os.getenv("MENU_SEARCH_LIMIT", "5"))
+
+# How much a query term counts depending on where it was found
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "category": 2.0,
+    "dietary_info": 2.0,
+    "customization": 1.0,
+    "description": 1.0,
+}
+# Weight of a partial word match, e.g. "burger" in "cheeseburger"
+PARTIAL_WEIGHT = 0.5
+MIN_PARTIAL_LENGTH = 4
+
+
+def _parse_time(value: str) -> time:
+    hours, minutes = value.split(":")
+    return time(int(hours), int(minutes))
+
+
+class MenuCatalog:
+    """In-memory menu with an inverted index over the searchable fields.
+
+    A search only touches the postings of the query terms, so its cost grows
+    with the number of matches rather than the size of the menu.
+    """
+
+    def __init__(self, items: List[Dict], service_hours: Dict[str, Dict[str, str]]):
+        self.items = items
+        self.service_hours = {
+            window: (_parse_time(hours["start"]), _parse_time(hours["end"]))
+            for window, hours in service_hours.items()
+        }
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._by_category: Dict[str, Set[int]] = defaultdict(set)
+        self._by_window: Dict[str, Set[int]] = defaultdict(set)
+        self._available: Set[int] = set()
+
+        for item_id, item in enumerate(items):
+            self._index(item_id, item)
+
+    @classmethod
+    def from_file(cls, path: str = MENU_FILE) -> "MenuCatalog":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["items"], data["service_hours"])
+
+    @property
+    def categories(self) -> List[str]:
+        return sorted(self._by_category)
+
+    def current_window(self, now: datetime) -> Optional[str]:
+        """The service window (breakfast, all_day, late_night) open at the given hotel time"""
+        current = now.time()
+        for window, (start, end) in self.service_hours.items():
+            if start <= end:
+                if start <= current < end:
+                    return window
+            elif current >= start or current < end:
+                # Window that runs past midnight
+                return window
+        return None
+
+    def search(
+        self,
+        query: str,
+        *,
+        category: Optional[str] = None,
+        window: Optional[str] = None,
+        available_only: bool = True,
+        limit: int = MENU_SEARCH_LIMIT,
+    ) -> List[Dict]:
+        """Top matching items, optionally restricted to a category and a service window"""
+        # The filters are checked per candidate, no set bigger than the postings is built
+        in_category = self._by_category.get(category.lower(), set()) if category else None
+        in_window = self._by_window.get(window, set()) if window else None
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            for item_id, weight in self._postings.get(term, {}).items():
+                if available_only and item_id not in self._available:
+                    continue
+                if in_category is not None and item_id not in in_category:
+                    continue
+                if in_window is not None and item_id not in in_window:
+                    continue
+                scores[item_id] += weight
+
+        if not scores:
+            return []
+        ranked = sorted(scores, key=lambda item_id: (-scores[item_id], self.items[item_id]["name"]))
+        return [self.items[item_id] for item_id in ranked[:limit]]
+
+    def browse(
+        self,
+        *,
+        category: Optional[str] = None,
+        window: Optional[str] = None,
+        limit: int = MENU_SEARCH_LIMIT,
+    ) -> List[Dict]:
+        """Available items for a category and service window, when the query matched nothing"""
+        item_ids = set(self._available)
+        if category:
+            item_ids &= self._by_category.get(category.lower(), set())
+        if window:
+            item_ids &= self._by_window.get(window, set())
+        return [self.items[item_id] for item_id in sorted(item_ids)[:limit]]
+
+    def _index(self, item_id: int, item: Dict) -> None:
+        category = item.get("category", "")
+        self._by_category[category].add(item_id)
+        for window in item.get("service_windows", list(self.service_hours)):
+            self._by_window[window].add(item_id)
+        if item.get("available", True):
+            self._available.add(item_id)
+
+        fields = {
+            "name": item.get("name", ""),
+            "category": category.replace("_", " "),
+            "dietary_info": " ".join(item.get("dietary_info", [])),
+            "customization": " ".join(item.get("customization", [])),
+            "description": item.get("description", ""),
+        }
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for term in tokenize(text):
+                self._add_posting(term, item_id, weight)
+                # Index the parts of long words so "burger" finds "cheeseburger"
+                for part in self._partials(term):
+                    self._add_posting(part, item_id, weight * PARTIAL_WEIGHT)
+
+    def _add_posting(self, term: str, item_id: int, weight: float) -> None:
+        postings = self._postings[term]
+        postings[item_id] = max(postings.get(item_id, 0.0), weight)
+
+    @staticmethod
+    def _partials(term: str) -> Set[str]:
+        if len(term) < 2 * MIN_PARTIAL_LENGTH:
+            return set()
+        parts = set()
+        for i in range(MIN_PARTIAL_LENGTH, len(term) - MIN_PARTIAL_LENGTH + 1):
+            parts.add(term[:i])
+            parts.add(term[i:])
+        return parts
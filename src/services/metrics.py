@@ -0,0 +1,372 @@
+import bisect
+import dataclasses
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pydantic_ai import RunContext
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.settings import ModelSettings
+from pydantic_ai.usage import Usage
+
+from src.models.hotel_models import RunEnded
+from src.services.wrapped_model import WrappedModel
+
+# Route the Prometheus scrape endpoint is served on, empty to disable it
+METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+
+# Upper bounds in seconds, from a cached tool call to a long multi-agent turn
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=False)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base of the metric types, values are kept per combination of label values.
+
+    Updates are plain dict operations on the event loop thread, cheap enough to
+    leave instrumentation on permanently.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+
+class CallbackGauge(Metric):
+    """Gauge whose values are read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Dict[LabelValues, float]],
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self.collect().items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label values: count per bucket (last one is +Inf), sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts, strict=False):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {total[0]}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+registry: List[Metric] = []
+
+AGENT_RUN_SECONDS = Histogram(
+    "hotel_agent_run_seconds", "Duration of agent runs, including their tool calls", ["agent"]
+)
+DELEGATION_SECONDS = Histogram(
+    "hotel_delegation_seconds", "Duration of requests delegated by the supervisor", ["service"]
+)
+TOOL_SECONDS = Histogram("hotel_tool_seconds", "Duration of tool calls", ["tool"])
+TOOL_RESULT_TOKENS = Counter(
+    "hotel_tool_result_tokens_total",
+    "Tokens of tool results, stage raw as returned and kept after compaction",
+    ["tool", "stage"],
+)
+MODEL_REQUEST_SECONDS = Histogram(
+    "hotel_model_request_seconds",
+    "Duration of model requests, until the last streamed chunk",
+    ["agent", "model"],
+)
+MODEL_FIRST_TOKEN_SECONDS = Histogram(
+    "hotel_model_first_token_seconds",
+    "Time until a model response starts arriving (all of it when not streamed), by cache hit",
+    ["agent", "cache"],
+)
+MODEL_REQUESTS = Counter("hotel_model_requests_total", "Model requests", ["agent", "model"])
+MODEL_TOKENS = Counter(
+    "hotel_model_tokens_total",
+    "Tokens used by model requests, type cached counts prompt cache hits",
+    ["agent", "model", "type"],
+)
+ERRORS = Counter(
+    "hotel_errors_total",
+    "Failed operations by exception type, e.g. UsageLimitExceeded",
+    ["kind", "name", "error"],
+)
+MODEL_TIER_RUNS = Counter(
+    "hotel_model_tier_runs_total",
+    "Agent runs by model tier, an escalated run counts once per tier",
+    ["agent", "tier"],
+)
+MODEL_TIER_SECONDS = Histogram(
+    "hotel_model_tier_run_seconds", "Duration of agent runs by model tier", ["agent", "tier"]
+)
+MODEL_ESCALATIONS = Counter(
+    "hotel_model_escalations_total",
+    "Agent runs moved past their default model tier, by the tier left and why "
+    "(invalid, failed, complex, urgent)",
+    ["agent", "tier", "reason"],
+)
+CANCELLATIONS = Counter(
+    "hotel_cancellations_total",
+    "Work cancelled before it finished, scope turn or tool, "
+    "reason new_message, disconnect, stop or deadline",
+    ["scope", "reason"],
+)
+HEDGED_REQUESTS = Counter(
+    "hotel_hedged_requests_total",
+    "Backup requests sent for slow or failed ones, and how many of them won",
+    ["target", "outcome"],
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "hotel_admission_wait_seconds", "Time model requests waited for the rate limits", ["priority"]
+)
+IN_FLIGHT = Gauge("hotel_in_flight", "Operations currently running", ["kind", "name"])
+
+# Caches whose statistics are exported, by name
+caches: Dict[str, Any] = {}
+
+
+def register_cache(name: str, cache: Any) -> None:
+    """Export the stats and hit rate of a SearchCache"""
+    caches[name] = cache
+
+
+CACHE_LOOKUPS = CallbackGauge(
+    "hotel_cache_lookups",
+    "Cache lookups since start by outcome",
+    ["cache", "outcome"],
+    lambda: {
+        (name, outcome): value
+        for name, cache in caches.items()
+        for outcome, value in cache.stats.items()
+    },
+)
+CACHE_HIT_RATIO = CallbackGauge(
+    "hotel_cache_hit_ratio",
+    "Share of cache lookups that needed no upstream call",
+    ["cache"],
+    lambda: {(name,): cache.hit_rate for name, cache in caches.items()},
+)
+
+
+def record_error(kind: str, name: str, error: BaseException) -> None:
+    ERRORS.inc(kind=kind, name=name, error=type(error).__name__)
+
+
+class Track:
+    """Time a block into histogram, count it as in flight and record what it raised
+    (a RunEnded ends a run early and is not an error).
+
+    Works with both "with" and "async with". The histogram's first label is set
+    to name unless labels are given.
+    """
+
+    def __init__(self, kind: str, name: str, histogram: Histogram, **labels: str):
+        self.kind = kind
+        self.name = name
+        self.histogram = histogram
+        self.labels = labels or {histogram.labelnames[0]: name}
+        self.start = 0.0
+
+    def __enter__(self) -> "Track":
+        IN_FLIGHT.inc(kind=self.kind, name=self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Optional[BaseException], traceback: Any) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        IN_FLIGHT.dec(kind=self.kind, name=self.name)
+        if exc is not None and not isinstance(exc, RunEnded):
+            record_error(self.kind, self.name, exc)
+
+    async def __aenter__(self) -> "Track":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type: Any, exc: Optional[BaseException], traceback: Any) -> None:
+        self.__exit__(exc_type, exc, traceback)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+
+# Streamed model response being read by the current task, the response's tool calls run inside it
+current_stream: ContextVar[Optional[StreamedResponse]] = ContextVar("current_stream", default=None)
+
+
+def run_usage(ctx: RunContext[Any]) -> Usage:
+    """Usage of the run so far, including the model response whose tool calls are running.
+
+    pydantic-ai adds a streamed response's tokens to the run only once its tool
+    calls returned, so a tool that ends the run has to count them itself.
+    """
+    usage = dataclasses.replace(ctx.usage, details=dict(ctx.usage.details or {}))
+    stream = current_stream.get()
+    response = ctx.messages[-1] if ctx.messages else None
+    if stream is None or not isinstance(response, ModelResponse):
+        return usage
+    if response.timestamp == stream.timestamp():
+        usage.incr(stream.usage())
+    return usage
+
+
+class InstrumentedModel(WrappedModel):
+    """Model wrapper that records latency and token usage of every request by agent"""
+
+    def __init__(self, model: Model | str, agent: str):
+        super().__init__(model)
+        self.agent = agent
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> tuple[ModelResponse, Usage]:
+        with Track(
+            "model", self.agent, MODEL_REQUEST_SECONDS, agent=self.agent, model=self.model_name
+        ) as timer:
+            response, usage = await self.wrapped.request(
+                messages, model_settings, model_request_parameters
+            )
+        self._record_usage(usage, time.perf_counter() - timer.start)
+        return response, usage
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        stream: Optional[StreamedResponse] = None
+        first_token = 0.0
+        try:
+            with Track(
+                "model", self.agent, MODEL_REQUEST_SECONDS, agent=self.agent, model=self.model_name
+            ) as timer:
+                async with self.wrapped.request_stream(
+                    messages, model_settings, model_request_parameters
+                ) as stream:
+                    # The stream is opened with its first chunk
+                    first_token = time.perf_counter() - timer.start
+                    token = current_stream.set(stream)
+                    try:
+                        yield stream
+                    finally:
+                        current_stream.reset(token)
+        finally:
+            if stream is not None:
+                self._record_usage(stream.usage(), first_token)
+
+    def _record_usage(self, usage: Usage, first_token: float) -> None:
+        labels = {"agent": self.agent, "model": self.model_name}
+        cached = (usage.details or {}).get("cached_tokens", 0)
+        MODEL_REQUESTS.inc(**labels)
+        MODEL_TOKENS.inc(usage.request_tokens or 0, type="request", **labels)
+        MODEL_TOKENS.inc(cached, type="cached", **labels)
+        MODEL_TOKENS.inc(usage.response_tokens or 0, type="response", **labels)
+        # Whether the cache cuts the time to first token shows in the two series side by side
+        cache = "hit" if cached else "miss"
+        MODEL_FIRST_TOKEN_SECONDS.observe(first_token, agent=self.agent, cache=cache)
+
+
+def install(app: Any, path: str = METRICS_PATH) -> None:
+    """Serve the metrics on the Chainlit FastAPI app, ahead of Chainlit's catch-all route"""
+    if not path or getattr(app.state, "metrics_installed", False):
+        return
+    app.state.metrics_installed = True
+
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+
+    async def metrics_endpoint(request: Any) -> PlainTextResponse:
+        return PlainTextResponse(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    # Chainlit serves its frontend for every unknown path, so the route has to come first
+    app.router.routes.insert(0, Route(path, metrics_endpoint, methods=["GET"]))
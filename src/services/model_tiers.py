@@ -0,0 +1,127 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pydantic_ai import Agent
+from pydantic_ai.exceptions import UnexpectedModelBehavior
+from pydantic_ai.models import Model
+from pydantic_ai.result import RunResult
+
+from src.services.admission import URGENT, AdmittedModel, current_priority
+from src.services.metrics import (
+    MODEL_ESCALATIONS,
+    MODEL_TIER_RUNS,
+    MODEL_TIER_SECONDS,
+    InstrumentedModel,
+    Track,
+)
+
+MODEL_TIERS_FILE = os.getenv(
+    "MODEL_TIERS_FILE", os.path.join(os.path.dirname(__file__), "..", "data", "model_tiers.json")
+)
+
+
+def is_failed(data: Any) -> bool:
+    """Whether an agent result is a Failed response"""
+    return isinstance(data, dict) and "reason" in data
+
+
+class ModelTiers:
+    """Which model each agent runs on, and when a run moves to a stronger one.
+
+    Tiers are ordered fastest first. An agent starts on its configured tier
+    unless the request looks complex (long message) or urgent, in which case it
+    starts on the strongest. A run that fails validation or returns Failed is
+    repeated on the next tier. Runs and escalations are counted per agent and
+    tier, so the policy can be tuned from the escalation rate.
+    """
+
+    def __init__(self, tiers: List[Tuple[str, str]], agents: Dict[str, str], complex_words: int):
+        self.tiers = [name for name, _ in tiers]
+        self.models = dict(tiers)
+        self.agents = agents
+        self.complex_words = complex_words
+        self._wrapped: Dict[Tuple[str, str], Model] = {}
+
+    @classmethod
+    def from_file(cls, path: str = MODEL_TIERS_FILE) -> "ModelTiers":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        tiers = [(tier["name"], tier["model"]) for tier in data["tiers"]]
+        return cls(tiers, data.get("agents", {}), data.get("complex_words", 40))
+
+    @property
+    def strongest(self) -> str:
+        return self.tiers[-1]
+
+    def model(self, agent: str, tier: Optional[str] = None) -> Model:
+        """The agent's model on tier (by default its own), instrumented and rate limited"""
+        tier = tier or self.default_tier(agent)
+        model = self._wrapped.get((agent, tier))
+        if model is None:
+            model = AdmittedModel(InstrumentedModel(self.models[tier], agent=agent))
+            self._wrapped[(agent, tier)] = model
+        return model
+
+    def default_tier(self, agent: str) -> str:
+        return self.agents.get(agent, self.strongest)
+
+    def initial_tier(self, agent: str, text: str) -> str:
+        """Tier a run of agent for the guest's text starts on"""
+        tier = self.default_tier(agent)
+        if tier == self.strongest:
+            return tier
+        if current_priority.get() == URGENT:
+            return self.escalate(agent, tier, "urgent") or tier
+        if len(text.split()) > self.complex_words:
+            return self.escalate(agent, tier, "complex") or tier
+        return tier
+
+    def escalate(self, agent: str, tier: str, reason: str) -> Optional[str]:
+        """The tier after tier, or None when already on the strongest"""
+        if tier == self.strongest:
+            return None
+        MODEL_ESCALATIONS.inc(agent=agent, tier=tier, reason=reason)
+        next_tier = self.tiers[self.tiers.index(tier) + 1]
+        print(f'⬆️ Escalating {agent} from {tier} to {next_tier} ({reason})')
+        return next_tier
+
+    def escalation_reason(
+        self, data: Any = None, error: Optional[BaseException] = None
+    ) -> Optional[str]:
+        """Why a run's outcome calls for a stronger model, None if it does not"""
+        if isinstance(error, (UnexpectedModelBehavior, ValidationError)):
+            return "invalid"
+        if error is None and is_failed(data):
+            return "failed"
+        return None
+
+    def track(self, agent: str, tier: str) -> Track:
+        """Count and time a run of agent on tier"""
+        MODEL_TIER_RUNS.inc(agent=agent, tier=tier)
+        return Track("tier", agent, MODEL_TIER_SECONDS, agent=agent, tier=tier)
+
+    async def run(self, agent: Agent, prompt: str, *, text: str, **kwargs: Any) -> RunResult:
+        """agent.run on the text's tier, repeated on stronger tiers while the outcome needs it"""
+        tier = self.initial_tier(agent.name, text)
+        while True:
+            try:
+                with self.track(agent.name, tier):
+                    result = await agent.run(prompt, model=self.model(agent.name, tier), **kwargs)
+            except Exception as e:
+                reason = self.escalation_reason(error=e)
+                next_tier = reason and self.escalate(agent.name, tier, reason)
+                if not next_tier:
+                    raise
+                tier = next_tier
+                continue
+
+            reason = self.escalation_reason(result.data)
+            next_tier = reason and self.escalate(agent.name, tier, reason)
+            if not next_tier:
+                return result
+            tier = next_tier
+
+
+model_tiers = ModelTiers.from_file()
@@ -0,0 +1,220 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+
+# Characters that end the plain run of a JSON string
+STRING_SPECIAL_RE = re.compile(r'["\\]')
+WHITESPACE = " \t\r\n"
+
+
+@dataclass
+class FieldDelta:
+    """A piece of a top-level field: more text of a string, or the whole value once complete"""
+    field: str
+    delta: str = ""
+    complete: bool = False
+    value: Any = None
+
+
+class PartialObjectDecoder:
+    """Incremental decoder for a JSON object streamed in chunks.
+
+    Parser state is kept between chunks, so every character is looked at once
+    no matter how often the partial result is inspected. String values are
+    emitted as deltas while they arrive; numbers, booleans and nested values
+    are emitted once they are complete.
+    """
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self.done = False
+        self._state = "start"
+        self._key = ""
+        self._buffer: List[str] = []
+        self._escape = ""
+        self._high_surrogate = ""
+        self._depth = 0
+        self._in_string = False
+
+    def feed(self, chunk: str) -> List[FieldDelta]:
+        """Consume the next chunk of JSON text and return what it added"""
+        deltas: List[FieldDelta] = []
+        i = 0
+        while i < len(chunk) and not self.done:
+            i = self._step(chunk, i, deltas)
+        return deltas
+
+    def _step(self, chunk: str, i: int, deltas: List[FieldDelta]) -> int:
+        state = self._state
+        char = chunk[i]
+
+        if state == "string":
+            return self._string(chunk, i, deltas)
+        if state == "key":
+            end = chunk.find('"', i)
+            # Keys are plain identifiers here, escapes are not worth supporting
+            if end == -1:
+                self._key += chunk[i:]
+                return len(chunk)
+            self._key += chunk[i:end]
+            self._state = "colon"
+            return end + 1
+        if state == "scalar":
+            if char in ",}" or char in WHITESPACE:
+                self._complete(json.loads("".join(self._buffer)), deltas)
+                return i  # the delimiter is handled in the next state
+            self._buffer.append(char)
+            return i + 1
+        if state == "nested":
+            return self._nested(chunk, i, deltas)
+
+        if char in WHITESPACE:
+            return i + 1
+        if state == "start" and char == "{":
+            self._state = "key_or_end"
+        elif state == "key_or_end" and char == '"':
+            self._key = ""
+            self._state = "key"
+        elif state in ("key_or_end", "after_value") and char == "}":
+            self.done = True
+        elif state == "colon" and char == ":":
+            self._state = "value"
+        elif state == "value":
+            self._buffer = []
+            if char == '"':
+                self.values[self._key] = ""
+                self._state = "string"
+            elif char in "{[":
+                self._buffer.append(char)
+                self._depth = 1
+                self._in_string = False
+                self._state = "nested"
+            else:
+                self._buffer.append(char)
+                self._state = "scalar"
+        elif state == "after_value" and char == ",":
+            self._state = "key_or_end"
+        else:
+            raise ValueError(f"Unexpected {char!r} in state {state}")
+        return i + 1
+
+    def _string(self, chunk: str, i: int, deltas: List[FieldDelta]) -> int:
+        if self._escape:
+            return self._escaped(chunk, i, deltas)
+
+        match = STRING_SPECIAL_RE.search(chunk, i)
+        end = match.start() if match else len(chunk)
+        if end > i:
+            self._append(chunk[i:end], deltas)
+        if match is None:
+            return end
+        if chunk[end] == "\\":
+            self._escape = "\\"
+            return end + 1
+        self._complete(self.values[self._key], deltas)
+        return end + 1
+
+    def _escaped(self, chunk: str, i: int, deltas: List[FieldDelta]) -> int:
+        self._escape += chunk[i]
+        # \uXXXX needs all four hex digits, every other escape is one character
+        if self._escape[1] == "u" and len(self._escape) < 6:
+            return i + 1
+        sequence, self._escape = self._escape, ""
+
+        if self._high_surrogate:
+            sequence, self._high_surrogate = self._high_surrogate + sequence, ""
+        elif sequence[1] == "u" and 0xD800 <= int(sequence[2:], 16) <= 0xDBFF:
+            # Wait for the low half of the surrogate pair
+            self._high_surrogate = sequence
+            return i + 1
+        self._append(json.loads(f'"{sequence}"'), deltas)
+        return i + 1
+
+    def _nested(self, chunk: str, i: int, deltas: List[FieldDelta]) -> int:
+        char = chunk[i]
+        self._buffer.append(char)
+        if self._in_string:
+            if self._escape:
+                self._escape = ""
+            elif char == "\\":
+                self._escape = "\\"
+            elif char == '"':
+                self._in_string = False
+        elif char == '"':
+            self._in_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+            if not self._depth:
+                self._complete(json.loads("".join(self._buffer)), deltas)
+        return i + 1
+
+    def _append(self, text: str, deltas: List[FieldDelta]) -> None:
+        self.values[self._key] += text
+        if deltas and deltas[-1].field == self._key and not deltas[-1].complete:
+            deltas[-1].delta += text
+        else:
+            deltas.append(FieldDelta(field=self._key, delta=text))
+
+    def _complete(self, value: Any, deltas: List[FieldDelta]) -> None:
+        self.values[self._key] = value
+        deltas.append(FieldDelta(field=self._key, complete=True, value=value))
+        self._buffer = []
+        self._state = "after_value"
+
+
+class ResultStreamDecoder:
+    """Follows the final result tool call of a streamed model response.
+
+    Only the argument text added since the previous tick is decoded, which
+    replaces validating the whole accumulated partial result on every tick.
+    """
+
+    def __init__(self, result_tool_prefix: str = "final_result"):
+        self.result_tool_prefix = result_tool_prefix
+        self.tool_name: Optional[str] = None
+        self.failed = False
+        self._consumed = 0
+        self._decoder = PartialObjectDecoder()
+
+    @property
+    def partial(self) -> Dict[str, Any]:
+        """Fields decoded so far, strings may still be incomplete"""
+        return self._decoder.values
+
+    def feed(self, response: ModelResponse) -> List[FieldDelta]:
+        part = self._result_part(response)
+        if part is None or self.failed:
+            return []
+        if isinstance(part.args, dict):
+            # Some models hand over parsed arguments, there is nothing to decode
+            changed = [
+                FieldDelta(field=field, complete=True, value=value)
+                for field, value in part.args.items()
+                if self._decoder.values.get(field) != value
+            ]
+            self._decoder.values.update(part.args)
+            return changed
+
+        new_text = part.args[self._consumed:]
+        self._consumed = len(part.args)
+        try:
+            return self._decoder.feed(new_text)
+        except ValueError:
+            # Malformed arguments, leave it to the validation of the final result
+            self.failed = True
+            return []
+
+    def _result_part(self, response: ModelResponse) -> Optional[ToolCallPart]:
+        for part in response.parts:
+            if not isinstance(part, ToolCallPart):
+                continue
+            if self.tool_name is None and part.tool_name.startswith(self.result_tool_prefix):
+                self.tool_name = part.tool_name
+            if part.tool_name == self.tool_name:
+                return part
+        return None
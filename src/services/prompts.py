@@ -0,0 +1,87 @@
+from datetime import datetime
+from typing import Callable, Dict, Iterable
+from zoneinfo import ZoneInfo
+
+from pydantic_ai import RunContext
+
+from src.models.hotel_models import HotelDeps, Location
+from src.services.hotel_registry import Hotel, hotel_registry
+from src.services.lifecycle import on_startup
+
+# Heads the volatile context at the end of a prompt
+CONTEXT_HEADER = "Current context:"
+
+
+def hotel_facts(location: Location) -> str:
+    return (
+        f'The hotel is {location.name}, located in {location.full_address}. '
+        f'Times are local to the hotel ({location.timezone}).'
+    )
+
+
+class PromptLibrary:
+    """Static system prompt prefixes per agent and hotel.
+
+    Providers cache prompts by exact prefix, so nothing that changes between
+    requests goes into the system prompt: the prefix of an agent at a hotel is
+    built once and reused byte for byte, while the date, guest and room are
+    appended to the end of the user prompt by with_context. Prefixes are kept
+    with the hotel in the registry, so they are evicted and rebuilt with it.
+    """
+
+    def __init__(self):
+        self.instructions: Dict[str, str] = {}
+
+    def register(self, agent: str, instructions: str) -> None:
+        self.instructions[agent] = instructions
+
+    def prefix(self, agent: str, hotel: Hotel) -> str:
+        return hotel.artifact(
+            f'prompt:{agent}',
+            lambda: f'{self.instructions[agent]}\n\n{hotel_facts(hotel.location)}',
+        )
+
+    def system_prompt(self, agent: str) -> Callable[[RunContext[HotelDeps]], str]:
+        """System prompt function for the agent, returning its prefix for the guest's hotel.
+
+        Agents register it with dynamic=True, so runs continuing a message history
+        also get the prefix of the hotel as currently loaded, not the one they started with.
+        """
+        def static_prefix(ctx: RunContext[HotelDeps]) -> str:
+            return self.prefix(agent, hotel_registry.get(ctx.deps.hotel_id))
+        return static_prefix
+
+    def precompute(self, hotels: Iterable[Hotel]) -> None:
+        """Build the prefixes of every agent at the given hotels"""
+        for hotel in hotels:
+            for agent in self.instructions:
+                self.prefix(agent, hotel)
+
+
+def volatile_context(deps: HotelDeps) -> str:
+    """What changes from request to request, kept out of the cached prefix"""
+    now = datetime.now(ZoneInfo(deps.hotel_location.timezone))
+    return (
+        f'{CONTEXT_HEADER}\n'
+        f'- Local time at the hotel: {now:%A, %Y-%m-%d %H:%M}\n'
+        f'- Guest: {deps.guest_name}, room {deps.room_number}'
+    )
+
+
+def with_context(prompt: str, deps: HotelDeps) -> str:
+    """The prompt followed by the volatile context, after everything that can be cached"""
+    return f'{prompt}\n\n{volatile_context(deps)}'
+
+
+def without_context(prompt: str) -> str:
+    """The prompt as it was before with_context added the volatile context"""
+    return prompt.rpartition(f'\n\n{CONTEXT_HEADER}\n')[0] or prompt
+
+
+prompt_library = PromptLibrary()
+
+
+@on_startup
+async def precompute_prompts() -> None:
+    # Load the properties the cache holds, with their prompt prefixes
+    prompt_library.precompute(hotel_registry.warm())
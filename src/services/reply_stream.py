@@ -0,0 +1,51 @@
+import os
+
+import chainlit as cl
+
+# Stream the reply to the guest as it is generated, instead of sending it once the run finished
+STREAM_REPLIES = os.getenv("STREAM_REPLIES", "true").lower() in ("1", "true", "yes")
+# Seconds between partial results while streaming, a small value keeps the UI chatty but cheap
+STREAM_DEBOUNCE = float(os.getenv("STREAM_DEBOUNCE", "0.05"))
+
+
+class ReplyStream:
+    """Guest-facing message that grows while the agent's result is streamed.
+
+    The message is only created with the first visible text, so nothing empty
+    shows up while agents are still working.
+    """
+
+    def __init__(self, enabled: bool = STREAM_REPLIES):
+        self.enabled = enabled
+        self.message: cl.Message | None = None
+
+    @property
+    def text(self) -> str:
+        return self.message.content if self.message is not None else ""
+
+    async def update(self, text: str) -> None:
+        """Show text, streaming only what was added since the last update"""
+        if not self.enabled or not text or text == self.text:
+            return
+        if self.message is None:
+            self.message = cl.Message(content="")
+        if text.startswith(self.text):
+            await self.message.stream_token(text[len(self.text):])
+        else:
+            # The partial result changed shape (e.g. became a failure), replace what was shown
+            await self.message.stream_token(text, is_sequence=True)
+
+    async def cancel(self) -> None:
+        """Take back what was shown, the reply will not be finished"""
+        if self.message is not None:
+            await self.message.remove()
+            self.message = None
+
+    async def finish(self, text: str) -> None:
+        """Show the final text and end the stream"""
+        if self.message is None:
+            await cl.Message(content=text).send()
+            return
+        if text != self.text:
+            await self.message.stream_token(text, is_sequence=True)
+        await self.message.send()
@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.services.metrics import register_cache
+
+# Entries kept in memory
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+# Seconds a search result stays fresh, and a shorter one for searches without results
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "21600"))
+SEARCH_CACHE_EMPTY_TTL = float(os.getenv("SEARCH_CACHE_EMPTY_TTL", "600"))
+# Optional SQLite file so cached results survive restarts, empty to keep the cache in memory only
+SEARCH_CACHE_DB = os.getenv("SEARCH_CACHE_DB", "")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share an entry"""
+    return " ".join(query.lower().split())
+
+
+def make_key(query: str, location: str, gl: str, hl: str) -> str:
+    """Cache key for a search at a given hotel location, country and language"""
+    raw = json.dumps([normalize_query(query), location, gl, hl])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class SearchCache:
+    """Two tier (memory LRU + optional SQLite) TTL cache with single-flight fetching.
+
+    Concurrent lookups for the same key wait on one upstream fetch instead of
+    each calling the API. Also used for crawled pages, values only need to be
+    JSON serializable.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SEARCH_CACHE_SIZE,
+        ttl: float = SEARCH_CACHE_TTL,
+        empty_ttl: float = SEARCH_CACHE_EMPTY_TTL,
+        db_path: str = SEARCH_CACHE_DB,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.empty_ttl = empty_ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache "
+                "(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups that did not need their own upstream call"""
+        saved = self.stats["hits"] + self.stats["disk_hits"] + self.stats["coalesced"]
+        lookups = saved + self.stats["misses"]
+        return saved / lookups if lookups else 0.0
+
+    async def get_or_fetch(
+        self, key: str, fetch: Callable[[], Awaitable[Optional[Any]]]
+    ) -> tuple[Any, bool]:
+        """Return (value, cached) for key, calling fetch on a miss.
+
+        fetch returns None for results that must not be cached (errors), in which
+        case None is returned to every waiting caller.
+        """
+        value = self._get_memory(key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value, True
+
+        # Someone is already fetching this key, share their result
+        if key in self._inflight:
+            self.stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(self._inflight[key]), True
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                # The caller we were waiting on was cancelled (its guest left), fetch ourselves
+                return await self.get_or_fetch(key, fetch)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._get_disk(key)
+            if value is not None:
+                self.stats["disk_hits"] += 1
+                cached = True
+            else:
+                self.stats["misses"] += 1
+                cached = False
+                value = await fetch()
+                if value is not None:
+                    await self.set(key, value)
+            future.set_result(value)
+            return value, cached
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def set(self, key: str, value: Any) -> None:
+        ttl = self.ttl if value else self.empty_ttl
+        expires_at = time.time() + ttl
+        self._set_memory(key, expires_at, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._write_disk, key, expires_at, json.dumps(value))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM search_cache")
+                self._db.commit()
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_memory(self, key: str, expires_at: float, value: Any) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def _get_disk(self, key: str) -> Optional[Any]:
+        if self._db is None:
+            return None
+        row = await asyncio.to_thread(self._read_disk, key)
+        if row is None:
+            return None
+        expires_at, raw = row
+        value = json.loads(raw)
+        # Promote to the memory tier
+        self._set_memory(key, expires_at, value)
+        return value
+
+    def _read_disk(self, key: str) -> Optional[tuple[float, str]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT expires_at, value FROM search_cache WHERE key = ? AND expires_at >= ?",
+                (key, time.time()),
+            ).fetchone()
+        return row
+
+    def _write_disk(self, key: str, expires_at: float, raw: str) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO search_cache (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, raw),
+            )
+            # Drop expired rows while we hold the lock anyway
+            self._db.execute("DELETE FROM search_cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+
+# Shared cache for the web search tool
+search_cache = SearchCache()
+register_cache("search", search_cache)
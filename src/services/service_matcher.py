@@ -0,0 +1,80 @@
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List
+
+SERVICES_FILE = os.getenv(
+    "SERVICES_FILE", os.path.join(os.path.dirname(__file__), "..", "data", "services.json")
+)
+
+# Most urgent first when several services match
+PRIORITY_ORDER = {"emergency": 0, "high": 1, "normal": 2, "low": 3}
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """Regex alternation for words with shared prefixes factored out.
+
+    A flat "a|b|c" alternation retries every keyword at each position; the
+    trie form rejects a position after a handful of character checks no matter
+    how many keywords there are.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}  # end of a keyword
+
+    def build(node: Dict) -> str:
+        ends = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 and not ends else "(?:" + "|".join(branches) + ")"
+        return body + "?" if ends else body
+
+    return build(trie)
+
+
+class ServiceMatcher:
+    """Single-pass, word boundary aware matcher over the maintenance service catalog"""
+
+    def __init__(self, services: List[Dict]):
+        self.services = services
+        self._services_by_keyword: Dict[str, List[int]] = defaultdict(list)
+        for service_id, service in enumerate(services):
+            for word in service["keywords"]:
+                self._services_by_keyword[word.lower()].append(service_id)
+
+        # Whole words only, with an optional plural ending, so "ac" does not match "vacuum"
+        pattern = _trie_pattern(sorted(self._services_by_keyword))
+        self._pattern = re.compile(rf"\b({pattern})(?:e?s)?\b")
+
+    @classmethod
+    def from_file(cls, path: str = SERVICES_FILE) -> "ServiceMatcher":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @property
+    def keywords(self) -> List[str]:
+        return list(self._services_by_keyword)
+
+    def match(self, text: str) -> List[Dict]:
+        """Details of every service mentioned in text, most urgent first"""
+        hits: Dict[int, int] = defaultdict(int)
+        for found in self._pattern.finditer(text.lower()):
+            for service_id in self._services_by_keyword[found.group(1)]:
+                hits[service_id] += 1
+
+        ranked = sorted(
+            hits,
+            key=lambda service_id: (
+                PRIORITY_ORDER.get(
+                    self.services[service_id]["details"].get("priority"), len(PRIORITY_ORDER)
+                ),
+                -hits[service_id],
+                service_id,
+            ),
+        )
+        return [self.services[service_id]["details"] for service_id in ranked]
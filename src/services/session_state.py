@@ -0,0 +1,81 @@
+import os
+from typing import List, Optional
+
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
+from pydantic_ai.usage import Usage
+
+from src.services.event_log import event_log
+from src.services.memory import ConversationMemory, Turn
+from src.services.session_store import SessionStore, session_store
+
+# Seconds a run suspended on a question to the guest waits for their reply
+SUSPENDED_RUN_TTL = float(os.getenv("SUSPENDED_RUN_TTL", "3600"))
+# Turns read back from the event log when a session's memory was lost (e.g. a restart)
+RESTORED_TURNS = 50
+
+
+class SessionState:
+    """Per-session view of the shared store: conversation memory and usage counters"""
+
+    def __init__(self, session_id: str, store: SessionStore = session_store):
+        self.session_id = session_id
+        self.store = store
+
+    def key(self, name: str) -> str:
+        return f"session:{self.session_id}:{name}"
+
+    async def load_memory(self) -> ConversationMemory:
+        data = await self.store.get(self.key("memory"))
+        if data:
+            return ConversationMemory.from_dict(data)
+        return await self.restore_memory()
+
+    async def restore_memory(self) -> ConversationMemory:
+        """Memory rebuilt from the session's logged turns, the most recent that fit its budget"""
+        memory = ConversationMemory()
+        events = await event_log.history(self.session_id, kinds=["turn"], limit=RESTORED_TURNS)
+        tokens = 0
+        for event in reversed(events):
+            turn = Turn(user=event.data["user"], assistant=event.data["assistant"])
+            tokens += turn.tokens
+            if tokens > memory.token_budget and len(memory.turns) >= memory.min_recent_turns:
+                break
+            memory.turns.insert(0, turn)
+        if memory.turns:
+            turns = len(memory.turns)
+            print(f'♻️ Restored {turns} turns of session {self.session_id} from the event log')
+        return memory
+
+    async def save_memory(self, memory: ConversationMemory) -> None:
+        await self.store.set(self.key("memory"), memory.to_dict())
+
+    async def add_usage(self, usage: Usage) -> Usage:
+        """Add a run's usage to the session counters and return the session totals"""
+        totals = await self.store.incr(
+            self.key("usage"),
+            {
+                "requests": usage.requests,
+                "request_tokens": usage.request_tokens or 0,
+                "response_tokens": usage.response_tokens or 0,
+                "total_tokens": usage.total_tokens or 0,
+                "cached_tokens": (usage.details or {}).get("cached_tokens", 0),
+            },
+        )
+        cached_tokens = totals.pop("cached_tokens", 0)
+        return Usage(**totals, details={"cached_tokens": cached_tokens})
+
+    async def suspend_run(self, messages: List[ModelMessage]) -> None:
+        """Checkpoint a run waiting for the guest's reply"""
+        data = ModelMessagesTypeAdapter.dump_python(messages, mode="json")
+        await self.store.set(self.key("suspended_run"), data, ttl=SUSPENDED_RUN_TTL)
+
+    async def pop_suspended_run(self) -> Optional[List[ModelMessage]]:
+        """Messages of the run waiting for the guest's reply, if any, taking it off the session"""
+        data = await self.store.get(self.key("suspended_run"))
+        if data is None:
+            return None
+        await self.store.delete_prefix(self.key("suspended_run"))
+        return ModelMessagesTypeAdapter.validate_python(data)
+
+    async def clear(self) -> None:
+        await self.store.delete_prefix(self.key(""))
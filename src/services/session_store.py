@@ -0,0 +1,252 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from src.services.http_client import http_client
+from src.services.lifecycle import on_shutdown
+
+# Where per-session state lives: "memory" (single process), "sqlite" (workers on one host)
+# or "http" (workers on several hosts, see src/services/state_server.py)
+SESSION_STATE_BACKEND = os.getenv("SESSION_STATE_BACKEND", "memory")
+SESSION_STATE_DB = os.getenv("SESSION_STATE_DB", "session_state.db")
+SESSION_STATE_URL = os.getenv("SESSION_STATE_URL", "http://localhost:8700")
+# Seconds the state of an idle session is kept
+SESSION_STATE_TTL = float(os.getenv("SESSION_STATE_TTL", "86400"))
+# Keys kept by the in-process store, the least recently used are evicted first
+SESSION_STATE_MAX_KEYS = int(os.getenv("SESSION_STATE_MAX_KEYS", "100000"))
+
+
+class SessionStore(ABC):
+    """Key-value store shared by every worker process, values are JSON serializable"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        """Value of key, None when missing or expired"""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float = SESSION_STATE_TTL) -> None:
+        """Store value under key"""
+
+    @abstractmethod
+    async def add(self, key: str, value: Any, ttl: float = SESSION_STATE_TTL) -> bool:
+        """Store value only if key is missing or expired, returning whether it was stored"""
+
+    @abstractmethod
+    async def incr(
+        self, key: str, amounts: Dict[str, int], ttl: float = SESSION_STATE_TTL
+    ) -> Dict[str, int]:
+        """Atomically add amounts to the counters stored under key and return the new totals"""
+
+    @abstractmethod
+    async def delete_prefix(self, prefix: str) -> int:
+        """Delete every key starting with prefix, returning how many were deleted"""
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Release whatever the store holds open, the store is not used afterwards"""
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store, only correct when a single worker serves every session"""
+
+    def __init__(self, max_keys: int = SESSION_STATE_MAX_KEYS):
+        self.max_keys = max_keys
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float = SESSION_STATE_TTL) -> None:
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+    async def add(self, key: str, value: Any, ttl: float = SESSION_STATE_TTL) -> bool:
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def incr(
+        self, key: str, amounts: Dict[str, int], ttl: float = SESSION_STATE_TTL
+    ) -> Dict[str, int]:
+        totals = dict(await self.get(key) or {})
+        for name, amount in amounts.items():
+            totals[name] = totals.get(name, 0) + amount
+        await self.set(key, totals, ttl)
+        return totals
+
+    async def delete_prefix(self, prefix: str) -> int:
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    async def close(self) -> None:
+        self._entries.clear()
+
+
+class SqliteSessionStore(SessionStore):
+    """Store in a SQLite file in WAL mode, shared by the workers of one host"""
+
+    def __init__(self, path: str = SESSION_STATE_DB):
+        # Autocommit, transactions that read before writing are opened explicitly
+        self._db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS session_state "
+            "(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        # Expired rows are ignored by reads, drop the ones left over from earlier runs
+        self._db.execute("DELETE FROM session_state WHERE expires_at <= ?", (time.time(),))
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Any]:
+        row = await self._run(
+            lambda db: db.execute(
+                "SELECT value FROM session_state WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    async def set(self, key: str, value: Any, ttl: float = SESSION_STATE_TTL) -> None:
+        await self._run(
+            lambda db: db.execute(
+                "INSERT OR REPLACE INTO session_state (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, time.time() + ttl, json.dumps(value)),
+            )
+        )
+
+    async def add(self, key: str, value: Any, ttl: float = SESSION_STATE_TTL) -> bool:
+        now = time.time()
+        cursor = await self._run(
+            lambda db: db.execute(
+                "INSERT INTO session_state (key, expires_at, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE "
+                "SET expires_at = excluded.expires_at, value = excluded.value "
+                "WHERE session_state.expires_at <= ?",
+                (key, now + ttl, json.dumps(value), now),
+            )
+        )
+        return cursor.rowcount > 0
+
+    async def incr(
+        self, key: str, amounts: Dict[str, int], ttl: float = SESSION_STATE_TTL
+    ) -> Dict[str, int]:
+        def update(db: sqlite3.Connection) -> Dict[str, int]:
+            now = time.time()
+            # Take the write lock up front so concurrent workers cannot lose an increment
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT value FROM session_state WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                totals = json.loads(row[0]) if row else {}
+                for name, amount in amounts.items():
+                    totals[name] = totals.get(name, 0) + amount
+                db.execute(
+                    "INSERT OR REPLACE INTO session_state (key, expires_at, value) "
+                    "VALUES (?, ?, ?)",
+                    (key, now + ttl, json.dumps(totals)),
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            return totals
+
+        return await self._run(update)
+
+    async def delete_prefix(self, prefix: str) -> int:
+        cursor = await self._run(
+            lambda db: db.execute(
+                "DELETE FROM session_state WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            )
+        )
+        return cursor.rowcount
+
+    async def close(self) -> None:
+        await self._run(lambda db: db.close())
+
+    async def _run(self, operation: Callable[[sqlite3.Connection], Any]) -> Any:
+        def locked() -> Any:
+            with self._lock:
+                return operation(self._db)
+
+        return await asyncio.to_thread(locked)
+
+
+class HttpSessionStore(SessionStore):
+    """Client for a network key-value service speaking the state_server protocol"""
+
+    def __init__(self, url: str = SESSION_STATE_URL):
+        self.url = url.rstrip("/")
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await self._call("get", key=key)
+
+    async def set(self, key: str, value: Any, ttl: float = SESSION_STATE_TTL) -> None:
+        await self._call("set", key=key, value=value, ttl=ttl)
+
+    async def add(self, key: str, value: Any, ttl: float = SESSION_STATE_TTL) -> bool:
+        return await self._call("add", key=key, value=value, ttl=ttl)
+
+    async def incr(
+        self, key: str, amounts: Dict[str, int], ttl: float = SESSION_STATE_TTL
+    ) -> Dict[str, int]:
+        return await self._call("incr", key=key, amounts=amounts, ttl=ttl)
+
+    async def delete_prefix(self, prefix: str) -> int:
+        return await self._call("delete_prefix", prefix=prefix)
+
+    async def close(self) -> None:
+        # Connections belong to the shared HTTP client, which closes them itself
+        pass
+
+    async def _call(self, operation: str, **arguments: Any) -> Any:
+        # Reads and blind writes are safe to retry, add and incr are not
+        max_retries = 0 if operation in ("add", "incr") else 2
+        response = await http_client.request(
+            "POST", f"{self.url}/{operation}", json=arguments, max_retries=max_retries
+        )
+        if response.status != 200:
+            raise RuntimeError(
+                f"Session state {operation} failed with HTTP {response.status}: {response.text}"
+            )
+        return response.json()["result"]
+
+
+def create_session_store(backend: str = SESSION_STATE_BACKEND) -> SessionStore:
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SqliteSessionStore()
+    if backend == "http":
+        return HttpSessionStore()
+    raise ValueError(f"Unknown SESSION_STATE_BACKEND: {backend}")
+
+
+# Shared store for every session served by this worker
+session_store = create_session_store()
+
+
+@on_shutdown
+async def close_session_store() -> None:
+    await session_store.close()
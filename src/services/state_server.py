@@ -0,0 +1,52 @@
+"""Minimal network key-value service for session state.
+
+Stands in for a shared store when several Chainlit workers run behind a load
+balancer, and for local testing of the "http" backend:
+
+    python -m src.services.state_server --port 8700 [--db session_state.db]
+"""
+import argparse
+import json
+from typing import Any, Dict
+
+from aiohttp import web
+
+from src.services.session_store import MemorySessionStore, SessionStore, SqliteSessionStore
+
+OPERATIONS = ("get", "set", "add", "incr", "delete_prefix")
+
+
+def create_app(store: SessionStore) -> web.Application:
+    async def handle(request: web.Request) -> web.Response:
+        operation = request.match_info["operation"]
+        if operation not in OPERATIONS:
+            return web.json_response({"error": f"Unknown operation: {operation}"}, status=404)
+        try:
+            arguments: Dict[str, Any] = await request.json()
+            result = await getattr(store, operation)(**arguments)
+        except (json.JSONDecodeError, TypeError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+        return web.json_response({"result": result})
+
+    async def close_store(app: web.Application) -> None:
+        await store.close()
+
+    app = web.Application()
+    app.router.add_post("/{operation}", handle)
+    app.on_cleanup.append(close_store)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Session state key-value service")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--db", default="", help="SQLite file to persist state, in memory if empty")
+    args = parser.parse_args()
+
+    store = SqliteSessionStore(args.db) if args.db else MemorySessionStore()
+    web.run_app(create_app(store), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import re
+from typing import List
+
+WORD_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+def normalize(word: str) -> str:
+    """Lowercase and strip a plural 's' so 'towels' matches 'towel'"""
+    word = word.lower()
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized words"""
+    return [normalize(word) for word in WORD_RE.findall(text.lower())]
+
+
+def keyword(text: str) -> str:
+    """Normalize a keyword or phrase the same way text is tokenized"""
+    return " ".join(tokenize(text))
@@ -0,0 +1,44 @@
+from functools import lru_cache
+from typing import Any
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional, fall back to a character based estimate
+    tiktoken = None
+
+# Model whose tokenizer is used for budgeting
+TOKENIZER_MODEL = "gpt-4o"
+
+
+@lru_cache(maxsize=4)
+def _get_encoding(model: str) -> Any:
+    """Load (once) the tokenizer for the given model, or None if unavailable"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        # Unknown model or the encoding file could not be fetched
+        return None
+
+
+def count_tokens(text: str, model: str = TOKENIZER_MODEL) -> int:
+    """Count the tokens in text, using the model's tokenizer when available"""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        # Roughly four characters per token for English text
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def clip_to_tokens(text: str, max_tokens: int, model: str = TOKENIZER_MODEL) -> str:
+    """Truncate text so that it fits within max_tokens"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return text[: max(max_tokens - 1, 0) * 4].rstrip() + "…"
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[: max(max_tokens - 1, 0)]).rstrip() + "…"
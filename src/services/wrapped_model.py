@@ -0,0 +1,27 @@
+from functools import cached_property
+
+from pydantic_ai.models import Model, infer_model
+
+
+class WrappedModel(Model):
+    """Base of the model wrappers, delegating to the model they wrap.
+
+    A model given by name is only resolved on first use, so building an agent
+    does not import the provider's SDK (the OpenAI client alone takes about a
+    second to import).
+    """
+
+    def __init__(self, model: Model | str):
+        self._model = model
+
+    @cached_property
+    def wrapped(self) -> Model:
+        return infer_model(self._model)
+
+    @property
+    def model_name(self) -> str:
+        return self.wrapped.model_name
+
+    @property
+    def system(self) -> str | None:
+        return self.wrapped.system
@@ -0,0 +1,71 @@
+import asyncio
+
+from src.services.browser_pool import BrowserPool
+
+
+class SlowCrawler:
+    """Crawler whose launch takes a while, counting how many were started"""
+    launched = 0
+
+    def __init__(self, startup=0.2):
+        self.startup = startup
+
+    async def __aenter__(self):
+        SlowCrawler.launched += 1
+        await asyncio.sleep(self.startup)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def arun(self, url):
+        await asyncio.sleep(0.01)
+        return url
+
+
+def test_page_loads_go_on_while_a_browser_launches():
+    async def scenario():
+        pool = BrowserPool(size=2, max_concurrent_pages=4, crawler_factory=SlowCrawler)
+        await pool.start()
+        busy = pool._instances[0]
+        busy.active += 1
+        slow = [SlowCrawler(startup=1.0) for _ in range(2)]
+        pool.crawler_factory = lambda: slow.pop()
+        pool._instances[1].retiring = True  # a replacement starts on the next lease
+
+        started = asyncio.get_running_loop().time()
+        replacement = asyncio.create_task(pool.fetch("https://a.example"))
+        await asyncio.sleep(0)
+        # The other lease shares the running browser instead of waiting for the launch
+        assert await pool.fetch("https://b.example") == "https://b.example"
+        assert asyncio.get_running_loop().time() - started < 0.5
+        assert await replacement == "https://a.example"
+        busy.active -= 1
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_leases_launch_at_most_size_browsers():
+    async def scenario():
+        SlowCrawler.launched = 0
+        pool = BrowserPool(size=2, max_concurrent_pages=8, crawler_factory=SlowCrawler)
+        urls = [f"https://{i}.example" for i in range(8)]
+        assert await asyncio.gather(*(pool.fetch(url) for url in urls)) == urls
+        assert SlowCrawler.launched == 2
+        assert pool.stats["instances"] == 2
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_shuts_down_browsers_still_starting():
+    async def scenario():
+        pool = BrowserPool(size=1, crawler_factory=SlowCrawler)
+        start = asyncio.create_task(pool.start())
+        await asyncio.sleep(0)
+        await pool.close()
+        assert pool.stats["instances"] == 0
+        await asyncio.gather(start, return_exceptions=True)
+
+    asyncio.run(scenario())
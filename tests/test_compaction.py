@@ -0,0 +1,40 @@
+import json
+import os
+
+import pytest
+
+from src.services.compaction import ToolOutputCompactor, load_policies
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "src", "data")
+AVAILABILITY = ("items_available", "staff_assigned", "technician_available", "staff_available")
+
+
+def load(name):
+    with open(os.path.join(DATA, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def compactor():
+    return ToolOutputCompactor(load_policies())
+
+
+@pytest.mark.parametrize(
+    "details",
+    [service["details"] for service in load("services.json")],
+    ids=lambda details: details["service"],
+)
+def test_check_service_keeps_availability(compactor, details):
+    (projected,) = compactor.compact("check_service", [details])
+    availability = [field for field in AVAILABILITY if field in details]
+    assert availability, "every service says whether it can be provided"
+    for field in availability:
+        assert projected[field] == details[field]
+    if "services" in details:
+        assert projected["services"] == details["services"]
+
+
+def test_search_menu_keeps_size_options(compactor):
+    item = {"name": "Coffee", "price": 4.5, "size_options": ["small", "large"], "available": True}
+    (projected,) = compactor.compact("search_menu", [item])
+    assert projected["size_options"] == ["small", "large"]
@@ -0,0 +1,29 @@
+from src.agents.tools.get_website import guest_message
+from src.models.hotel_models import HotelDeps
+from src.services.hotel_registry import hotel_registry
+from src.services.memory import ConversationMemory
+from src.services.prompts import with_context
+
+DEPS = HotelDeps(
+    room_number="101",
+    guest_name="Sunday Monday",
+    hotel_location=hotel_registry.get().location,
+)
+
+
+def test_guest_message_drops_the_volatile_context():
+    prompt = with_context("When does the museum open?", DEPS)
+    assert guest_message(prompt) == "When does the museum open?"
+
+
+def test_guest_message_drops_the_earlier_turns():
+    memory = ConversationMemory()
+    memory.add_turn("Any sushi nearby?", "Try Sushi Place on Main Street.")
+    prompt = with_context(
+        memory.prompt_with_context("Is it open on Sunday?", history=False), DEPS
+    )
+    assert guest_message(prompt) == "Is it open on Sunday?"
+
+
+def test_guest_message_keeps_a_plain_prompt():
+    assert guest_message("Opening hours of the museum") == "Opening hours of the museum"
@@ -0,0 +1,119 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.agents import supervisor_agent
+from src.models.hotel_models import Failed, TaskResponse
+from src.services.event_log import event_log
+from src.services.idempotency import (
+    IdempotencyStore,
+    MemoryIdempotencyBackend,
+    SessionStoreIdempotencyBackend,
+)
+from src.services.session_store import MemorySessionStore
+
+REQUEST = {"request_type": "maintenance", "description": "The heat is not working"}
+
+
+@pytest.fixture(params=["memory", "session_store"])
+def store(request):
+    if request.param == "memory":
+        return IdempotencyStore(MemoryIdempotencyBackend())
+    return IdempotencyStore(SessionStoreIdempotencyBackend(MemorySessionStore()))
+
+
+def test_released_request_can_be_made_again(store):
+    async def scenario():
+        scope = store.scope("session", "101")
+        assert await store.first_time(scope, "maintenance", "The heat is not working")
+        assert not await store.first_time(scope, "maintenance", "the heat is NOT working!")
+        await store.release(scope, "maintenance", "The heat is not working")
+        assert await store.first_time(scope, "maintenance", "The heat is not working")
+
+    asyncio.run(scenario())
+
+
+def test_release_leaves_other_requests_alone(store):
+    async def scenario():
+        scope = store.scope("session", "101")
+        await store.first_time(scope, "maintenance", "The heat is not working")
+        await store.first_time(scope, "room_service", "A burger please")
+        await store.release(scope, "maintenance", "The heat is not working")
+        assert not await store.first_time(scope, "room_service", "A burger please")
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def delegation(monkeypatch, store):
+    """run_delegation on an isolated store, with the specialist run replaced by outcome"""
+    monkeypatch.setattr(supervisor_agent, "idempotency_store", store)
+    monkeypatch.setattr(event_log, "path", "")  # no event log
+    ctx = SimpleNamespace(deps=SimpleNamespace(session_id="session", room_number="101"))
+
+    async def run(outcome):
+        async def specialist(ctx, request):
+            if isinstance(outcome, BaseException):
+                raise outcome
+            return outcome
+
+        monkeypatch.setattr(supervisor_agent, "_run_delegation", specialist)
+        return await supervisor_agent.run_delegation(ctx, REQUEST)
+
+    return run
+
+
+def test_completed_delegation_is_a_duplicate_afterwards(delegation):
+    async def scenario():
+        done = TaskResponse(status="completed", message="On its way", eta="10 minutes")
+        assert await delegation(done) == done
+        repeated = await delegation(done)
+        assert repeated["reason"] == supervisor_agent.DUPLICATE_REQUEST
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize(
+    "outcome", [Failed(reason="No technician"), asyncio.CancelledError(), TimeoutError()]
+)
+def test_unfinished_delegation_can_be_retried(delegation, outcome):
+    async def scenario():
+        try:
+            await delegation(outcome)
+        except (asyncio.CancelledError, TimeoutError):
+            pass
+        done = TaskResponse(status="completed", message="On its way", eta="10 minutes")
+        assert await delegation(done) == done
+
+    asyncio.run(scenario())
+
+
+def test_memory_backend_evicts_the_least_recently_used():
+    async def scenario():
+        backend = MemoryIdempotencyBackend(max_entries=2)
+        assert await backend.add("s", "a", 60)
+        assert await backend.add("s", "b", 60)
+        assert not await backend.add("s", "a", 60)  # a is used again
+        assert await backend.add("s", "c", 60)  # evicts b
+        assert not await backend.add("s", "a", 60)
+        assert await backend.add("s", "b", 60)
+
+    asyncio.run(scenario())
+
+
+def test_memory_backend_purges_every_expired_entry(monkeypatch):
+    async def scenario():
+        now = [1000.0]
+        monkeypatch.setattr("src.services.idempotency.time.time", lambda: now[0])
+        backend = MemoryIdempotencyBackend()
+        await backend.add("s", "a", 60)
+        await backend.add("s", "b", 60)
+        now[0] += 30
+        await backend.add("s", "a", 60)  # a's window restarts behind b
+        now[0] += 45
+        await backend.add("s", "c", 60)  # b expired, a did not
+        assert len(backend) == 2
+        assert not await backend.add("s", "a", 60)
+
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+import pytest
+
+from src.services.menu_catalog import MenuCatalog
+
+HOURS = {
+    "breakfast": {"start": "06:00", "end": "11:00"},
+    "late_night": {"start": "22:00", "end": "06:00"},
+}
+ITEMS = [
+    {"name": "Cheeseburger", "category": "mains", "service_windows": ["late_night"]},
+    {"name": "Veggie Burger", "category": "mains", "available": False},
+    {"name": "Burger Sliders", "category": "snacks", "service_windows": ["breakfast"]},
+    {"name": "Pancakes", "category": "breakfast", "service_windows": ["breakfast"]},
+]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return MenuCatalog(ITEMS, HOURS)
+
+
+def names(items):
+    return sorted(item["name"] for item in items)
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ({}, ["Burger Sliders", "Cheeseburger"]),
+        ({"available_only": False}, ["Burger Sliders", "Cheeseburger", "Veggie Burger"]),
+        ({"category": "Mains"}, ["Cheeseburger"]),
+        ({"window": "breakfast"}, ["Burger Sliders"]),
+        ({"category": "mains", "window": "breakfast"}, []),
+        ({"category": "desserts"}, []),
+    ],
+)
+def test_search_filters_each_candidate(catalog, filters, expected):
+    assert names(catalog.search("burger", **filters)) == expected
+
+
+def test_search_leaves_the_index_untouched(catalog):
+    catalog.search("burger", category="mains", window="late_night")
+    assert catalog._by_category["mains"] == {0, 1}
+    assert catalog._available == {0, 2, 3}
@@ -0,0 +1,47 @@
+import asyncio
+import dataclasses
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import SystemPromptPart
+from pydantic_ai.models.test import TestModel
+
+from src.models.hotel_models import HotelDeps
+from src.services import prompts
+from src.services.hotel_registry import hotel_registry
+from src.services.memory import ConversationMemory
+
+
+def system_prompt(messages):
+    return [part.content for part in messages[0].parts if isinstance(part, SystemPromptPart)]
+
+
+def test_history_runs_follow_a_reloaded_hotel(monkeypatch):
+    hotel = hotel_registry.get()
+    renamed = dataclasses.replace(
+        hotel,
+        location=dataclasses.replace(hotel.location, name="Renamed Hotel"),
+        artifacts={},
+    )
+    current = {"hotel": hotel}
+    monkeypatch.setattr(prompts.hotel_registry, "get", lambda hotel_id=None: current["hotel"])
+
+    library = prompts.PromptLibrary()
+    library.register("tester", "You are a test agent.")
+    agent = Agent(TestModel(), deps_type=HotelDeps)
+    agent.system_prompt(dynamic=True)(library.system_prompt("tester"))
+    deps = HotelDeps(room_number="101", guest_name="Guest", hotel_location=hotel.location)
+
+    async def scenario():
+        memory = ConversationMemory()
+        first = await agent.run("Hello", deps=deps)
+        memory.capture_system_prompts(first.all_messages())
+        memory.add_turn("Hello", first.data)
+        # The session outlives the property's reload, and the memory its worker
+        memory = ConversationMemory.from_dict(memory.to_dict())
+        current["hotel"] = renamed
+        second = await agent.run("Thanks", deps=deps, message_history=memory.history())
+        return system_prompt(first.all_messages()), system_prompt(second.all_messages())
+
+    before, after = asyncio.run(scenario())
+    assert hotel.location.name in before[0]
+    assert "Renamed Hotel" in after[0] and hotel.location.name not in after[0]
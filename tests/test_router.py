@@ -0,0 +1,37 @@
+import pytest
+
+from src.agents.router import router_for
+from src.services.hotel_registry import hotel_registry
+
+
+@pytest.fixture(scope="module")
+def router():
+    return router_for(hotel_registry.get())
+
+
+def test_second_request_after_a_conjunction_goes_to_the_supervisor(router):
+    route = router.classify("The heat is not working and I want a burger")
+    assert route.service is None
+
+
+def test_second_request_after_a_comma_goes_to_the_supervisor(router):
+    assert router.classify("The heat is not working, I want a burger").service is None
+
+
+@pytest.mark.parametrize(
+    "text, service",
+    [
+        ("The air conditioning is not working", "maintenance"),
+        ("Could I get some extra towels please", "maintenance"),
+        ("Can I get more towels and soap", "maintenance"),
+        ("I'd like to order a cheeseburger to my room", "room_service"),
+        ("Can you recommend a good italian restaurant nearby", "concierge"),
+    ],
+)
+def test_single_requests_are_routed(router, text, service):
+    assert router.classify(text).service == service
+
+
+def test_requests_for_two_services_go_to_the_supervisor(router):
+    route = router.classify("Please bring two pillows and book a table at a sushi place")
+    assert route.service is None
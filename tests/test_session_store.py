@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sqlite3
+
+import pytest
+
+from src.services.session_store import (
+    HttpSessionStore,
+    MemorySessionStore,
+    SessionStore,
+    SqliteSessionStore,
+)
+
+
+def test_every_store_implements_close():
+    class Incomplete(SessionStore):
+        async def get(self, key): ...
+        async def set(self, key, value, ttl=0): ...
+        async def add(self, key, value, ttl=0): ...
+        async def incr(self, key, amounts, ttl=0): ...
+        async def delete_prefix(self, prefix): ...
+
+    with pytest.raises(TypeError, match="close"):
+        Incomplete()
+
+
+def test_memory_store_close_drops_its_entries():
+    async def scenario():
+        store = MemorySessionStore()
+        await store.set("session:a:usage", {"total_tokens": 5})
+        await store.close()
+        return await store.get("session:a:usage")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_sqlite_store_close_closes_the_connection(tmp_path):
+    async def scenario():
+        store = SqliteSessionStore(os.path.join(tmp_path, "state.db"))
+        await store.set("session:a:usage", {"total_tokens": 5})
+        await store.close()
+        return store
+
+    store = asyncio.run(scenario())
+    with pytest.raises(sqlite3.ProgrammingError):
+        store._db.execute("SELECT 1")
+    # What was written before closing is still on disk
+    reopened = SqliteSessionStore(os.path.join(tmp_path, "state.db"))
+    assert asyncio.run(reopened.get("session:a:usage")) == {"total_tokens": 5}
+    asyncio.run(reopened.close())
+
+
+def test_http_store_close_needs_no_server():
+    # Nothing listens on this port, close must not try to reach it
+    asyncio.run(HttpSessionStore("http://127.0.0.1:9").close())